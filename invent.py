@@ -1,22 +1,63 @@
 import subprocess
 import sys
 
-# Install pandas if not already installed
-subprocess.check_call([sys.executable, "-m", "pip", "install", "reportlab"])
+# Install reportlab if not already installed. Worker processes re-import this
+# module, so only shell out to pip when the import actually fails. The barcode
+# encoder is tested against the reportlab releases in this range
+try:
+    import reportlab
+except ImportError:
+    if getattr(sys, 'frozen', False):
+        raise
+    subprocess.check_call([sys.executable, "-m", "pip", "install", "reportlab>=4,<6"])
 
 import pandas as pd
+import numpy as np
 import os
 import re
 import sys
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox, scrolledtext
+import reportlab
+from reportlab import rl_config
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Spacer, Paragraph, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, Spacer, Paragraph, PageBreak, Flowable
 from reportlab.lib.units import cm
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.lib.rl_accel import fp_str
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.graphics.barcode import qrencoder
+from reportlab.graphics.barcode.code128 import Code128
+from functools import lru_cache, partial
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import asyncio
+import base64
+import contextlib
+import copy
+import ctypes
+import ctypes.util
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import select
+import hashlib
 import threading
+import time
+import urllib.parse
+from PIL import Image, ImageDraw, ImageFont
+
+# Optional: lets multi-sheet jobs merge sheets rendered in parallel into one PDF
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
 
 # Style for bold part numbers - First version
 bold_style_v1 = ParagraphStyle(
@@ -67,8 +108,486 @@ class RedirectText:
     def flush(self):
         pass
 
-def format_part_no_v1(part_no):
-    """Format part number with first 7 characters in 17pt font, rest in 22pt font."""
+# Usable text width of the 11cm value column (5pt left and right padding)
+VALUE_CELL_WIDTH = 11 * cm - 10
+
+# Usable height of the v2 description cell (2.1cm minus default 3pt top/bottom padding)
+DESC_CELL_HEIGHT_V2 = 2.1 * cm - 6
+
+# Auto-fit never shrinks text below this size
+MIN_FONT_SIZE = 8
+
+# Glyph widths at 1pt per (font, character); widths scale linearly with font size
+_glyph_widths = {}
+
+def _glyph_width(char, font_name):
+    width = _glyph_widths.get((font_name, char))
+    if width is None:
+        width = _glyph_widths[(font_name, char)] = stringWidth(char, font_name, 1)
+    return width
+
+@lru_cache(maxsize=8192)
+def _unit_text_width(text, font_name):
+    """Width of text at 1pt, built from the memoized glyph width table."""
+    return sum(_glyph_width(char, font_name) for char in text)
+
+def text_width(text, font_name, font_size):
+    """Width of text in points, same result as reportlab's stringWidth."""
+    return _unit_text_width(text, font_name) * font_size
+
+@lru_cache(maxsize=8192)
+def fit_font_size(text, font_name, max_size, max_width=VALUE_CELL_WIDTH, min_size=MIN_FONT_SIZE):
+    """Largest font size (in half points, up to max_size) at which text fits on one line."""
+    width = _unit_text_width(text, font_name)
+    if width * max_size <= max_width:
+        return max_size
+    return max(min_size, math.floor(max_width / width * 2) / 2)
+
+@lru_cache(maxsize=8192)
+def _fit_part_no_sizes(part1, part2, size1, size2):
+    """Scale the two part number font sizes down together until the part number fits its cell."""
+    width = text_width(part1, 'Helvetica-Bold', size1) + text_width(part2, 'Helvetica-Bold', size2)
+    if width <= VALUE_CELL_WIDTH:
+        return size1, size2
+    scale = VALUE_CELL_WIDTH / width
+    return (max(MIN_FONT_SIZE, math.floor(size1 * scale * 2) / 2),
+            max(MIN_FONT_SIZE, math.floor(size2 * scale * 2) / 2))
+
+def _wrapped_line_count(text, font_name, font_size, max_width):
+    """Greedy word wrap using the glyph width table; returns None if a single word is too wide."""
+    space = text_width(' ', font_name, font_size)
+    lines = 1
+    line_width = 0
+    for word in text.split():
+        word_width = text_width(word, font_name, font_size)
+        if word_width > max_width:
+            return None
+        if line_width and line_width + space + word_width > max_width:
+            lines += 1
+            line_width = word_width
+        else:
+            line_width += (space if line_width else 0) + word_width
+    return lines
+
+@lru_cache(maxsize=8192)
+def fit_description(desc):
+    """
+    Pick the largest font size (up to desc_style.fontSize) at which the description fits the
+    v2 description cell. Returns (font_size, one_line), or (None, False) if it cannot fit.
+    """
+    max_size = desc_style.fontSize
+    if text_width(desc, desc_style.fontName, max_size) <= VALUE_CELL_WIDTH:
+        return max_size, True
+
+    avail_height = DESC_CELL_HEIGHT_V2 - desc_style.spaceBefore - desc_style.spaceAfter
+    size = max_size
+    while size >= MIN_FONT_SIZE:
+        lines = _wrapped_line_count(desc, desc_style.fontName, size, VALUE_CELL_WIDTH)
+        leading = desc_style.leading * size / max_size
+        if lines is not None and lines * leading <= avail_height:
+            return size, False
+        size -= 1
+    return None, False
+
+@lru_cache(maxsize=32)
+def _desc_style_for_size(font_size):
+    """Description style scaled down to font_size, keeping the leading proportional."""
+    return ParagraphStyle(
+        name=f'Description_{font_size}',
+        parent=desc_style,
+        fontSize=font_size,
+        leading=desc_style.leading * font_size / desc_style.fontSize
+    )
+
+class _CachedParagraph(Paragraph):
+    """Paragraph that remembers its wrap result, so reusing it in many tables wraps it only once."""
+
+    _wrapped_for = None
+
+    def wrap(self, availWidth, availHeight):
+        if self._wrapped_for != availWidth:
+            self._wrapped_size = Paragraph.wrap(self, availWidth, availHeight)
+            self._wrapped_for = availWidth
+        return self._wrapped_size
+
+class ParagraphCache:
+    """
+    Bounded LRU cache of parsed and wrapped Paragraphs keyed by (text, style, width).
+    Standard parts repeat on hundreds of labels, so their markup is parsed and wrapped once
+    instead of for every label. Drawing sets and deletes canv on the Paragraph, so every
+    get() hands out its own shallow copy sharing the parsed and wrapped lines; jobs in
+    different threads (e.g. two GUI runs) never draw the same object.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text, style, width=VALUE_CELL_WIDTH):
+        """Return a Paragraph for text in style, already wrapped to width."""
+        key = (text, style.name, width)
+        with self._lock:
+            para = self._items.get(key)
+            if para is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return copy.copy(para)
+            self.misses += 1
+
+        para = _CachedParagraph(text, style)
+        para.wrap(width, 0x7fffffff)
+
+        with self._lock:
+            self._items[key] = para
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return copy.copy(para)
+
+    def counters(self):
+        return self.hits, self.misses
+
+    def describe(self, since=(0, 0)):
+        """Hit-rate summary for the job log, optionally relative to an earlier counters() snapshot."""
+        hits = self.hits - since[0]
+        misses = self.misses - since[1]
+        total = hits + misses
+        rate = 100.0 * hits / total if total else 0.0
+        return (f"Paragraph cache: {hits} hits, {misses} misses ({rate:.1f}% hit rate), "
+                f"{len(self._items)}/{self.maxsize} entries")
+
+# Shared by all jobs in this process
+paragraph_cache = ParagraphCache()
+
+# Symbologies for the optional scan row, see generate_labels_from_excel_v1/_v2(barcodes=...)
+BARCODE_SYMBOLOGIES = ('code128', 'qr')
+
+# Height of the scan row added under each label when barcodes are enabled
+BARCODE_ROW_HEIGHT = 2 * cm
+
+# The scan row makes each label taller, so only 3 labels fit on an A4 page
+BARCODE_LABELS_PER_PAGE = 3
+
+# Widest Code128 module (narrow bar) drawn; shorter codes are not stretched beyond this
+BARCODE_MODULE_WIDTH = 0.03 * cm
+
+# Quiet zones in modules, as required by the Code128 and QR specifications
+CODE128_QUIET_MODULES = 10
+QR_QUIET_MODULES = 4
+
+# QR codes are made at error correction level M with mask pattern 0: any mask is valid, and
+# scoring all 8 for the "best" one costs 8x the encode time
+QR_ERROR_CORRECTION = qrencoder.QRErrorCorrectLevel.M
+QR_MASK_PATTERN = 0
+
+# GF(256) exp/log tables of the QR Reed-Solomon code (primitive polynomial x^8+x^4+x^3+x^2+1)
+_GF_EXP = [0] * 512
+_GF_LOG = [0] * 256
+_value = 1
+for _power in range(255):
+    _GF_EXP[_power] = _value
+    _GF_LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _power in range(255, 512):
+    _GF_EXP[_power] = _GF_EXP[_power - 255]
+del _value, _power
+
+# Pad codewords that fill unused QR data capacity, alternating
+QR_PAD_BYTES = (0xEC, 0x11)
+
+@lru_cache(maxsize=None)
+def _qr_template(version):
+    """
+    The parts of a QR symbol that only depend on its version (finder, timing, alignment,
+    format and version patterns) as an int8 module array with every data module set to its
+    mask bit, plus the row and column of each data module in bit order.
+    """
+    qr = qrencoder.QRCode(version, QR_ERROR_CORRECTION)
+    blocks = qrencoder.QRRSBlock.getRSBlocks(version, QR_ERROR_CORRECTION)
+    # All-zero codewords leave exactly the mask pattern in the data modules
+    qr.dataCache = [0] * sum(block.totalCount for block in blocks)
+    qr.makeImpl(False, QR_MASK_PATTERN)
+    cols, rows = np.array(qr.dataPosIterator(), dtype=np.intp).T
+    return np.array(qr.modules, dtype=np.int8), rows, cols
+
+@lru_cache(maxsize=None)
+def _rs_remainder_table(ec_count):
+    """
+    For each leading byte, the ec_count-byte multiple of the Reed-Solomon generator polynomial
+    to subtract, as one integer, so the remainder takes one shift and xor per data byte.
+    """
+    generator = [1]
+    for power in range(ec_count):
+        # Multiply by (x - a^power)
+        generator = [coefficient ^ (_GF_EXP[_GF_LOG[previous] + power] if previous else 0)
+                     for coefficient, previous in zip(generator + [0], [0] + generator)]
+    table = [0]
+    for factor in range(1, 256):
+        products = bytes(_GF_EXP[_GF_LOG[factor] + _GF_LOG[c]] if c else 0 for c in generator[1:])
+        table.append(int.from_bytes(products, 'big'))
+    return table
+
+class _QRBits:
+    """Bit sink for reportlab's QR data segments, which only call put(); kept as one integer."""
+
+    def __init__(self):
+        self.value = 0
+        self.length = 0
+
+    def put(self, num, length):
+        self.value = (self.value << length) | (num & ((1 << length) - 1))
+        self.length += length
+
+    def put_bytes(self, data):
+        self.value = (self.value << (8 * len(data))) | int.from_bytes(data, 'big')
+        self.length += 8 * len(data)
+
+def _qr_modules(qr):
+    """
+    Module matrix of a QRCode whose data and version are set, the same as reportlab's
+    makeImpl(False, QR_MASK_PATTERN) but without redrawing the fixed patterns and walking
+    the data path bit by bit for every code.
+    """
+    blocks = qrencoder.QRRSBlock.getRSBlocks(qr.version, QR_ERROR_CORRECTION)
+    data_count = sum(block.dataCount for block in blocks)
+    bits = _QRBits()
+    for segment in qr.dataList:
+        if isinstance(segment, qrencoder.QR8bitByte) and isinstance(segment.data, bytes):
+            # The common case for locations; the same bits as its write(), a byte at a time
+            segment.write_header(bits, qr.version)
+            bits.put_bytes(segment.data)
+        else:
+            segment.write(bits, qr.version)
+    if bits.length > data_count * 8:
+        raise ValueError(f"Data too long for a QR code ({bits.length} bits)")
+    # 4 terminator bits (fewer if the data fills the code) and zero bits up to a byte boundary,
+    # then pad bytes
+    length = (min(bits.length + 4, data_count * 8) + 7) // 8
+    data = list((bits.value << (length * 8 - bits.length)).to_bytes(length, 'big'))
+    data += [QR_PAD_BYTES[i % 2] for i in range(data_count - length)]
+
+    data_blocks = []
+    ec_blocks = []
+    offset = 0
+    for block in blocks:
+        block_data = data[offset:offset + block.dataCount]
+        offset += block.dataCount
+        ec_count = block.totalCount - block.dataCount
+        table = _rs_remainder_table(ec_count)
+        shift = 8 * (ec_count - 1)
+        mask = (1 << (8 * ec_count)) - 1
+        remainder = 0
+        for byte in block_data:
+            remainder = ((remainder << 8) & mask) ^ table[byte ^ (remainder >> shift)]
+        data_blocks.append(block_data)
+        ec_blocks.append(list(remainder.to_bytes(ec_count, 'big')))
+    # Codewords interleaved across blocks, data first
+    codewords = [byte for bytes_at in itertools.chain(itertools.zip_longest(*data_blocks),
+                                                      itertools.zip_longest(*ec_blocks))
+                 for byte in bytes_at if byte is not None]
+
+    modules, rows, cols = _qr_template(qr.version)
+    modules = modules.copy()
+    bits = np.unpackbits(np.array(codewords, dtype=np.uint8))[:len(rows)]
+    modules[rows[:len(bits)], cols[:len(bits)]] ^= bits.astype(np.int8)
+    return modules
+
+def _qr_matrix(value):
+    """QR module matrix of value, without quiet zone. Raises ValueError if value is too long."""
+    qr = qrencoder.QRCode(None, QR_ERROR_CORRECTION)
+    qr.addData(value)
+    try:
+        qr.version = qr.calculate_version()
+        return _qr_modules(qr)
+    except AttributeError:
+        # The fast path relies on reportlab internals; if a reportlab release changes them,
+        # let reportlab build the whole symbol itself
+        qr = qrencoder.QRCode(None, QR_ERROR_CORRECTION)
+        qr.addData(value)
+        try:
+            qr.make()
+        except Exception as e:
+            raise ValueError(f"Cannot encode {value!r} as QR: {e}") from e
+        size = qr.getModuleCount()
+        return np.array([[qr.isDark(row, col) for col in range(size)] for row in range(size)], dtype=np.int8)
+
+# reportlab's decomposed Code128: upper case letters are bars, lower case are spaces and
+# the letter is the width in modules; mapped to one '1' or '0' per module
+_CODE128_MODULES = {ord(letter): bit * width
+                    for width, (lower, upper) in enumerate(zip('abcdefghij', 'ABCDEFGHIJ'), 1)
+                    for letter, bit in ((lower, '0'), (upper, '1'))}
+
+def encode_barcode(value, symbology):
+    """
+    Encode value as Code128 or QR and return its modules as a 2D bool array, top row first,
+    quiet zones included. A Code128 symbol is a single row of modules stretched to the bar
+    height. Raises ValueError if value can't be encoded.
+    """
+    if symbology == 'code128':
+        code = Code128(value=value)
+        code.validate()
+        if not code.valid:
+            raise ValueError(f"Cannot encode {value!r} as Code128")
+        code.encode()
+        code.decompose()
+        row = code.decomposed.translate(_CODE128_MODULES).encode('ascii')
+        modules = np.zeros((1, len(row) + 2 * CODE128_QUIET_MODULES), dtype=bool)
+        modules[0, CODE128_QUIET_MODULES:-CODE128_QUIET_MODULES] = np.frombuffer(row, dtype=np.uint8) == ord('1')
+        return modules
+
+    if symbology == 'qr':
+        matrix = _qr_matrix(value)
+        size = len(matrix) + 2 * QR_QUIET_MODULES
+        modules = np.zeros((size, size), dtype=bool)
+        modules[QR_QUIET_MODULES:-QR_QUIET_MODULES, QR_QUIET_MODULES:-QR_QUIET_MODULES] = matrix
+        return modules
+
+    raise ValueError(f"Unknown barcode symbology {symbology!r}, use one of {BARCODE_SYMBOLOGIES}")
+
+class EncodedBarcode:
+    """
+    A value encoded once as Code128 or QR: the PDF operators that draw it in module units
+    (a 1-bit image mask, far shorter than one rectangle per bar) and its size in modules,
+    ready to be placed at any scale.
+    """
+
+    def __init__(self, value, symbology):
+        modules = encode_barcode(value, symbology)
+        self.modules_high, self.modules_wide = modules.shape
+        self.symbology = symbology
+        # The image only covers the symbol itself, from its first to its last dark module: the
+        # quiet zones are blank space in the cell, so they don't need image data
+        rows = np.flatnonzero(modules.any(axis=1))
+        cols = np.flatnonzero(modules.any(axis=0))
+        symbol = modules[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+        high, wide = symbol.shape
+        # Formatted once here instead of on every draw
+        data = np.packbits(symbol, axis=1).tobytes().hex()
+        self.operators = (f"q {wide} 0 0 {high} {cols[0]} {self.modules_high - 1 - rows[-1]} cm 0 g "
+                          f"BI /W {wide} /H {high} /IM true /D [1 0] /F /AHx ID {data}> EI Q")
+
+@lru_cache(maxsize=32768)
+def cached_barcode(value, symbology):
+    """EncodedBarcode from the per-process pool, so a part number repeated on many labels is encoded once."""
+    return EncodedBarcode(value, symbology)
+
+def _barcode_module_size(symbology, modules_wide, modules_high, max_width, height):
+    """(module width, module height) in points of a code scaled to fit max_width x height."""
+    if symbology == 'qr':
+        # Square modules
+        size = min(max_width / modules_wide, height / modules_high)
+        return size, size
+    # Full-height bars
+    return min(BARCODE_MODULE_WIDTH, max_width / modules_wide), height / modules_high
+
+def prepare_barcodes(values, symbology):
+    """
+    Encode every distinct value ahead of the render loop.
+    Returns (codes, failed): a dict of value -> EncodedBarcode (None where the value can't
+    be encoded) and the number of values that couldn't be encoded.
+    """
+    if symbology not in BARCODE_SYMBOLOGIES:
+        raise ValueError(f"Unknown barcode symbology {symbology!r}, use one of {BARCODE_SYMBOLOGIES}")
+    codes = {}
+    failed = 0
+    for value in pd.unique(pd.Series(values, dtype=object).astype(str)):
+        try:
+            codes[value] = cached_barcode(value, symbology)
+        except ValueError:
+            codes[value] = None
+            failed += 1
+    return codes, failed
+
+# Scan row 'Scan' caption as a compiled layout caption, placed the way a Table cell with
+# 5pt side padding, the default 3pt top/bottom padding and 12pt leading centres it
+BARCODE_SCAN_CAPTION = ('text', 'Helvetica', 16, colors.black, 2 * cm, 0.5,
+                        BARCODE_ROW_HEIGHT / 2 + 6 - 16, 'Scan', 4 * cm - 10)
+
+# The parts of a scan row that are the same on every label: the caption and the grid lines
+# around the row and the caption cell. Drawn once per document into a PDF form.
+BARCODE_ROW_CHROME = [
+    BARCODE_SCAN_CAPTION,
+    ('grid', 1, colors.black, [(0, BARCODE_ROW_HEIGHT, 15 * cm, BARCODE_ROW_HEIGHT), (0, 0, 15 * cm, 0),
+                               (0, BARCODE_ROW_HEIGHT, 0, 0), (4 * cm, BARCODE_ROW_HEIGHT, 4 * cm, 0),
+                               (15 * cm, BARCODE_ROW_HEIGHT, 15 * cm, 0)]),
+]
+
+@lru_cache(maxsize=1024)
+def _scan_row_layout(shapes):
+    """
+    Placement of the codes in a scan row, per (symbology, modules wide, modules high) of each
+    code or None for an empty cell. Returns the 'cm' operators that scale each code into its
+    cell (None for an empty cell) and the divider lines between the cells, all formatted once
+    per distinct combination of code sizes instead of once per label.
+    """
+    known = [shape[1] for shape in shapes if shape is not None]
+    fallback = sum(known) / len(known) if known else 1
+    weights = [shape[1] if shape is not None else fallback for shape in shapes]
+    widths = [11 * cm * weight / sum(weights) for weight in weights]
+    col_x = [0, 4 * cm]
+    for width in widths:
+        col_x.append(col_x[-1] + width)
+    placements = []
+    for shape, x, width in zip(shapes, col_x[1:], widths):
+        if shape is None:
+            placements.append(None)
+            continue
+        symbology, modules_wide, modules_high = shape
+        module_width, module_height = _barcode_module_size(symbology, modules_wide, modules_high,
+                                                           width - 10, BARCODE_ROW_HEIGHT - 10)
+        # Centred in the cell
+        x += (width - modules_wide * module_width) / 2
+        y = (BARCODE_ROW_HEIGHT - modules_high * module_height) / 2
+        placements.append(f"q {fp_str(module_width, 0, 0, module_height, x, y)} cm ")
+    # Round caps and joins like the rest of the grid
+    dividers = ' '.join(f"{fp_str(x, BARCODE_ROW_HEIGHT)} m {fp_str(x, 0)} l" for x in col_x[2:-1])
+    return placements, f" q 1 J 1 j 0 0 0 RG 1 w {dividers} S Q" if dividers else ''
+
+class BarcodeRowFlowable(Flowable):
+    """
+    Scan row of a label: a 'Scan' cell followed by one cell per EncodedBarcode (or None) with
+    the barcodes centred in their cells, drawn directly instead of through a Table per label.
+    The 11cm are shared in proportion to the codes' widths in modules, so a long location
+    code gets as much room as a short part number code. The static chrome is one shared form,
+    see BARCODE_ROW_CHROME; the codes and the lines between their cells are one literal.
+    A code goes straight into the page even when it is printed on many labels: its image
+    data is shorter than the PDF form object and page resource entries sharing it would take.
+    """
+
+    def __init__(self, codes):
+        Flowable.__init__(self)
+        placements, dividers = _scan_row_layout(tuple(
+            (code.symbology, code.modules_wide, code.modules_high) if code is not None else None
+            for code in codes))
+        self.width = 15 * cm
+        self.height = BARCODE_ROW_HEIGHT
+        self.hAlign = 'CENTER'
+        self.operators = ''.join(placement + code.operators + ' Q '
+                                 for placement, code in zip(placements, codes)
+                                 if code is not None) + dividers
+
+    def draw(self):
+        self.draw_row(self.canv)
+
+    def draw_row(self, canv):
+        """Draw the row with its bottom left corner at the canvas origin."""
+        if not canv.hasForm('BarcodeRowChrome'):
+            canv.beginForm('BarcodeRowChrome', -2, -2, self.width + 2, self.height + 2)
+            _draw_chrome(canv, BARCODE_ROW_CHROME)
+            canv.endForm()
+        canv.doForm('BarcodeRowChrome')
+        if self.operators:
+            canv.addLiteral(self.operators)
+
+def format_part_no(part_no, sizes, style, trailer=''):
+    """
+    Format a part number as a Paragraph: all but the last 5 characters at sizes[0], the last 5
+    at sizes[1], both shrunk together if it doesn't fit the value cell. trailer is appended markup.
+    """
     if not part_no or not isinstance(part_no, str):
         part_no = str(part_no)
 
@@ -76,33 +595,42 @@ def format_part_no_v1(part_no):
         split_point = len(part_no) - 5  # Calculate where to split based on total length
         part1 = part_no[:split_point]   # Everything except the last 5 characters
         part2 = part_no[-5:]            # Last 5 characters
-        return Paragraph(f"<b><font size=17>{part1}</font><font size=22>{part2}</font></b>", bold_style_v1)
+        size1, size2 = _fit_part_no_sizes(part1, part2, *sizes)  # Shrink long part numbers to fit
+        return paragraph_cache.get(f"<b><font size={size1}>{part1}</font><font size={size2}>{part2}</font></b>{trailer}", style)
     else:
         # If part number is too short, just use one size
-        return Paragraph(f"<b><font size=17>{part_no}</font></b>", bold_style_v1)
+        return paragraph_cache.get(f"<b><font size={sizes[0]}>{part_no}</font></b>{trailer}", style)
+
+def format_part_no_v1(part_no):
+    """Format part number with first 7 characters in 17pt font, rest in 22pt font."""
+    return format_part_no(part_no, (17, 22), bold_style_v1)
 
 def format_part_no_v2(part_no):
     """Format part number with different font sizes to prevent overlapping."""
-    if not part_no or not isinstance(part_no, str):
-        part_no = str(part_no)
-
-    if len(part_no) > 5:
-        split_point = len(part_no) - 5  # Calculate where to split based on total length
-        part1 = part_no[:split_point]   # Everything except the last 5 characters
-        part2 = part_no[-5:]
-        # Add extra padding to ensure space between text and bottom line
-        return Paragraph(f"<b><font size=34>{part1}</font><font size=40>{part2}</font></b><br/><br/>", bold_style_v2)
-    else:
-        # If part number is too short, just use one size
-        return Paragraph(f"<b><font size=34>{part_no}</font></b><br/><br/>", bold_style_v2)
+    # Add extra padding to ensure space between text and bottom line
+    return format_part_no(part_no, (34, 40), bold_style_v2, trailer='<br/><br/>')
 
 def format_description(desc):
-    """Format description text with proper wrapping."""
+    """
+    Format description text with proper wrapping.
+    Descriptions that fit on one line are returned as plain strings (drawn with the
+    description cell's FONTSIZE/LEADING) so no Paragraph has to be parsed and wrapped.
+    """
     if not desc or not isinstance(desc, str):
         desc = str(desc)
 
+    font_size = desc_style.fontSize
+
+    # Text with markup or line breaks still needs a Paragraph
+    if '<' not in desc and '&' not in desc and '\n' not in desc:
+        font_size, one_line = fit_description(desc)
+        if one_line:
+            return desc
+
     # Prepare the description for proper wrapping in the PDF
-    return Paragraph(desc, desc_style)
+    if font_size is not None and font_size < desc_style.fontSize:
+        return paragraph_cache.get(desc, _desc_style_for_size(font_size))
+    return paragraph_cache.get(desc, desc_style)
 
 def parse_location_string_v1(location_str):
     """
@@ -156,55 +684,220 @@ def parse_location_string_v2(location_str):
     print(f"Parsed location '{location_str}' into: {location_parts}")
     return location_parts
 
-def generate_labels_from_excel_v1(excel_file_path, output_pdf_path):
-    try:
-        print(f"Attempting to read Excel file: {excel_file_path}")
-        if not os.path.exists(excel_file_path):
-            print(f"Error: Excel file not found at {excel_file_path}")
-            return None
+# Names of the 7 components returned by parse_location_string_v2,
+# e.g. "12M_ST-140_R_0_2_A_1" -> zone 12M, station ST-140, side R, level 0, ...
+LOCATION_COMPONENTS = ['zone', 'station', 'side', 'level', 'position', 'bin', 'slot']
 
-        # Enhanced Excel reading with various engines to improve compatibility
-        try:
-            # Check if the file is CSV or Excel
-            if excel_file_path.lower().endswith('.csv'):
-                df = pd.read_csv(excel_file_path)
+def split_location_components(locations):
+    """
+    Vectorized version of parse_location_string_v2 for a whole column.
+    Returns a DataFrame with one column per entry in LOCATION_COMPONENTS.
+    """
+    locations = pd.Series(locations)
+    matches = locations.fillna('').astype(str).str.strip().str.findall(r'([^_\s]+)')
+    # Pad short locations with '' the way the per-row parser does
+    components = pd.DataFrame(
+        [(m + [''] * 7)[:7] for m in matches],
+        index=locations.index,
+        columns=range(7)
+    )
+    components.columns = LOCATION_COMPONENTS
+    return components
+
+# Label orders along the walk path, see rack_walk_order
+WALK_ORDERS = ('natural', 'serpentine')
+
+def _natural_key(value):
+    """Sort key that compares runs of digits as numbers, so 'LEVEL 2' < 'LEVEL 10' and 'ST-9' < 'ST-140'."""
+    parts = re.split(r'(\d+)', value)
+    return tuple(int(part) if i % 2 else part.casefold() for i, part in enumerate(parts)), value
+
+def natural_sort_codes(values):
+    """
+    Integer key per value that sorts in natural order, and the number of distinct keys.
+    Only the distinct values are compared in Python; ranking every value is one vectorized pass.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).fillna('').astype(str))
+    ranks = np.empty(len(uniques), dtype=np.int64)
+    ranks[sorted(range(len(uniques)), key=lambda i: _natural_key(uniques[i]))] = np.arange(len(uniques))
+    return ranks[codes], len(uniques)
+
+def rack_walk_order(components, walk='natural'):
+    """
+    Row positions that put parsed locations (see split_location_components) in walk order.
+    'natural' sorts by zone, station, side, level, position, bin and slot, numbers by value;
+    'serpentine' also reverses the position direction on every other level of a rack face,
+    so the walk goes along one level and back along the next.
+    The components become integer keys in one vectorized pass, packed into one int64 per
+    location and ordered with a single stable argsort; ties keep their original order.
+    """
+    if walk not in WALK_ORDERS:
+        raise ValueError(f"Unknown walk order {walk!r}, use one of {WALK_ORDERS}")
+    keys = []
+    sizes = []
+    for name in LOCATION_COMPONENTS:
+        codes, size = natural_sort_codes(components[name])
+        keys.append(codes)
+        sizes.append(max(size, 1))
+
+    if walk == 'serpentine':
+        level = LOCATION_COMPONENTS.index('level')
+        position = LOCATION_COMPONENTS.index('position')
+        # Level rank within each rack face (zone, station, side), so every face starts the same way
+        face = (keys[0] * sizes[1] + keys[1]) * sizes[2] + keys[2]
+        level_rank = pd.Series(keys[level]).groupby(face).rank(method='dense').to_numpy(dtype=np.int64)
+        keys[position] = np.where(level_rank % 2 == 0, sizes[position] - 1 - keys[position], keys[position])
+
+    if math.prod(sizes) < 2 ** 63:
+        packed = np.zeros(len(components), dtype=np.int64)
+        for codes, size in zip(keys, sizes):
+            packed = packed * size + codes
+        return np.argsort(packed, kind='stable')
+    # Too many distinct values to pack into 64 bits: sort on the separate keys instead
+    return np.lexsort(keys[::-1])
+
+class LocationIndex:
+    """
+    Hierarchical (trie) index over the parsed location components of a label DataFrame.
+    Each level of the trie is one component (zone -> station -> side -> level -> ...),
+    so a query like zone='12M', side='R' only walks the matching branches instead of
+    rescanning or regrouping the full DataFrame. Build it once and pass it as location_index
+    to the label builders to filter the same DataFrame again without re-indexing it.
+    """
+
+    def __init__(self, df, loc_col):
+        self.df = df
+        self.loc_col = loc_col
+        self.root = {}
+
+        # Row positions for every location, computed in a single pass
+        self.row_positions = df.groupby(loc_col, sort=False).indices
+
+        locations = list(self.row_positions.keys())
+        components = split_location_components(pd.Series(locations, dtype=object))
+        for location, values in zip(locations, components.itertuples(index=False)):
+            node = self.root
+            for value in values[:-1]:
+                node = node.setdefault(value, {})
+            node.setdefault(values[-1], []).append(location)
+
+    def __len__(self):
+        return len(self.row_positions)
+
+    def locations(self, **criteria):
+        """
+        Return the locations matching the given component criteria.
+        Each keyword is a name from LOCATION_COMPONENTS and its value is either a single
+        value or a collection of allowed values, e.g. station='ST-140', level=range(0, 3).
+        """
+        unknown = set(criteria) - set(LOCATION_COMPONENTS)
+        if unknown:
+            raise ValueError(f"Unknown location component(s): {sorted(unknown)}")
+
+        allowed = []
+        for name in LOCATION_COMPONENTS:
+            value = criteria.get(name)
+            if value is None:
+                allowed.append(None)
+            elif isinstance(value, (str, int, float)):
+                allowed.append({str(value)})
             else:
-                df = pd.read_excel(excel_file_path)
-        except Exception as first_error:
-            try:
-                print("First attempt failed, trying with engine='openpyxl'...")
-                df = pd.read_excel(excel_file_path, engine='openpyxl')
-            except Exception as second_error:
-                try:
-                    print("Second attempt failed, trying with engine='xlrd'...")
-                    df = pd.read_excel(excel_file_path, engine='xlrd')
-                except Exception as third_error:
-                    # Final attempt: try csv with different encodings
-                    try:
-                        df = pd.read_csv(excel_file_path, encoding='utf-8')
-                    except:
-                        df = pd.read_csv(excel_file_path, encoding='latin1')
+                allowed.append({str(v) for v in value})
 
-        print(f"Successfully read file with {len(df)} rows")
-        print("Columns found:", df.columns.tolist())
+        matches = []
 
-        # Display first few rows to help with debugging
-        print("\nFirst 2 rows of data:")
-        print(df.head(2))
+        def walk(node, depth):
+            for key in node:
+                if allowed[depth] is not None and key not in allowed[depth]:
+                    continue
+                if depth == len(LOCATION_COMPONENTS) - 1:
+                    matches.extend(node[key])
+                else:
+                    walk(node[key], depth + 1)
 
-    except Exception as e:
-        print(f"Error reading file: {e}")
-        return None
+        walk(self.root, 0)
+        return matches
 
-    # Set up key measurements
-    label_width = 15 * cm
-    label_height = 5 * cm
-    part_no_height = 1.3 * cm   # Height for part number rows
-    desc_loc_height = 0.8 * cm  # Height for description and location rows
+    def positions(self, **criteria):
+        """Return the sorted row positions of all rows at matching locations."""
+        locations = self.locations(**criteria)
+        if not locations:
+            return np.array([], dtype=np.intp)
+        return np.sort(np.concatenate([self.row_positions[loc] for loc in locations]))
 
-    # Identify column names in the file
-    cols = df.columns.tolist()
+    def subset(self, **criteria):
+        """Return only the rows of the indexed DataFrame at matching locations."""
+        return self.df.iloc[self.positions(**criteria)]
 
+def filter_locations(df, loc_col, location_filter, location_index=None):
+    """
+    Return the rows of df at locations matching location_filter (see LocationIndex.locations).
+    location_index is a LocationIndex built earlier over the same rows of df and is reused
+    instead of indexing df again; without one a new index is built for this call.
+    """
+    if location_index is None:
+        return LocationIndex(df, loc_col).subset(**location_filter)
+    if len(location_index.df) != len(df):
+        raise ValueError(f"location_index covers {len(location_index.df)} rows, the data has {len(df)}")
+    return df.iloc[location_index.positions(**location_filter)]
+
+# Hard limit: maximum 4 labels per page (each label has 2 parts)
+MAX_LABELS_PER_PAGE = 4
+
+# Background colours of the 7 location component cells
+LOCATION_COLORS = [
+    colors.HexColor('#E9967A'),  # Salmon
+    colors.HexColor('#ADD8E6'),  # Light Blue
+    colors.HexColor('#90EE90'),  # Light Green
+    colors.HexColor('#FFD700'),  # Gold
+    colors.HexColor('#ADD8E6'),  # Light Blue
+    colors.HexColor('#E9967A'),  # Salmon
+    colors.HexColor('#90EE90')   # Light Green
+]
+
+# Relative widths of the 7 location component cells - more space for the station (e.g. ST-140)
+LOCATION_COL_PROPORTIONS = [1.8, 2.7, 1.3, 1.3, 1.3, 1.3, 1.3]
+
+# Standard layout (v1) prints descriptions as plain text cut at this many characters
+DESCRIPTION_MAX_CHARS_V1 = 50
+
+# Per-label render time of a measured 5000-label render, used for dry-run time estimates
+SECONDS_PER_LABEL = {'v1': 0.0009, 'v2': 0.0008}
+# Render time with a scan row relative to the same labels without one, measured the same way
+BARCODE_RENDER_FACTOR = {'code128': 1.3, 'qr': 1.4}
+
+def read_label_file(excel_file_path, status_callback=None, nrows=None):
+    """
+    Read a label spreadsheet (Excel or CSV), trying several engines for compatibility.
+    nrows reads only the first rows, which stays fast however large the file is.
+    """
+    try:
+        # Check if the file is CSV or Excel
+        if excel_file_path.lower().endswith('.csv'):
+            return pd.read_csv(excel_file_path, nrows=nrows)
+        return pd.read_excel(excel_file_path, nrows=nrows)
+    except Exception as first_error:
+        try:
+            if status_callback:
+                status_callback("First attempt failed, trying with engine='openpyxl'...")
+            return pd.read_excel(excel_file_path, engine='openpyxl', nrows=nrows)
+        except Exception as second_error:
+            try:
+                if status_callback:
+                    status_callback("Second attempt failed, trying with engine='xlrd'...")
+                return pd.read_excel(excel_file_path, engine='xlrd', nrows=nrows)
+            except Exception as third_error:
+                # Final attempt: try csv with different encodings
+                try:
+                    return pd.read_csv(excel_file_path, encoding='utf-8', nrows=nrows)
+                except:
+                    return pd.read_csv(excel_file_path, encoding='latin1', nrows=nrows)
+
+def detect_label_columns(df, status_callback=None):
+    """
+    Normalize column names to uppercase and find the part number, description
+    and location columns, falling back to the first three columns.
+    """
     # Normalize column names (convert to uppercase)
     df.columns = [col.upper() for col in df.columns]
     cols = df.columns.tolist()
@@ -217,412 +910,630 @@ def generate_labels_from_excel_v1(excel_file_path, output_pdf_path):
     loc_col = next((col for col in cols if 'LOC' in col or 'POS' in col), None)
 
     if not part_no_col:
-        print(f"Warning: Could not find part number column in {cols}")
+        if status_callback:
+            status_callback(f"Warning: Could not find part number column in {cols}")
         part_no_col = cols[0]  # Use first column as fallback
 
     if not desc_col:
-        print(f"Warning: Could not find description column in {cols}")
+        if status_callback:
+            status_callback(f"Warning: Could not find description column in {cols}")
         desc_col = cols[1] if len(cols) > 1 else part_no_col  # Use second column as fallback
 
     if not loc_col:
-        print(f"Warning: Could not find location column in {cols}")
+        if status_callback:
+            status_callback(f"Warning: Could not find location column in {cols}")
         loc_col = cols[2] if len(cols) > 2 else desc_col  # Use third column as fallback
 
-    print(f"Using columns: Part No: {part_no_col}, Description: {desc_col}, Location: {loc_col}")
+    return part_no_col, desc_col, loc_col
 
-    # Group parts by location to create pairs
-    df_grouped = df.groupby(loc_col)
+def _description_overflows_v2(desc):
+    """Check whether a description wraps past the v2 description cell (or cannot be parsed)."""
+    if '<' in desc:
+        try:
+            para = Paragraph(desc, desc_style)
+            _, height = para.wrap(VALUE_CELL_WIDTH, DESC_CELL_HEIGHT_V2)
+        except Exception:
+            return 'markup'
+        if height + desc_style.spaceBefore + desc_style.spaceAfter > DESC_CELL_HEIGHT_V2:
+            return 'overflow'
+        return None
 
-    doc = SimpleDocTemplate(output_pdf_path, pagesize=A4)
-    elements = []
+    # Plain text is auto-fitted, so it only overflows if it doesn't fit at the minimum size
+    font_size, _ = fit_description(desc)
+    return 'overflow' if font_size is None else None
 
-    # Hard limit: maximum 4 labels per page (each label has 2 parts)
-    MAX_LABELS_PER_PAGE = 4
+def validate_label_data(df, part_no_col, desc_col, loc_col, layout='v2'):
+    """
+    Check every row of a label DataFrame before rendering and return all problems at once.
+    Returns a DataFrame with columns row (spreadsheet row number), column, severity and problem.
+    """
+    issues = []
 
-    # Keep track of labels for pagination
-    label_count = 0
+    def add(mask, column, severity, problem):
+        # A spreadsheet's integer index keeps its row numbers through filtering; any other
+        # index (e.g. from a render_labels caller) is reported by position instead
+        if pd.api.types.is_integer_dtype(df.index):
+            rows = df.index[mask.to_numpy()]
+        else:
+            rows = pd.Index(np.flatnonzero(mask.to_numpy()))
+        if len(rows):
+            issues.append(pd.DataFrame({
+                'row': rows + 2,  # +1 for the header row, +1 for 1-based numbering
+                'column': column,
+                'severity': severity,
+                'problem': problem,
+            }))
+
+    def missing(col):
+        values = df[col].astype(str).str.strip()
+        return df[col].isna() | values.isin(['', 'nan', 'None'])
+
+    part_nos = df[part_no_col].astype(str)
+    descs = df[desc_col].astype(str)
+    locations = df[loc_col].fillna('').astype(str).str.strip()
+
+    missing_part = missing(part_no_col)
+    missing_loc = missing(loc_col)
+    add(missing_part, part_no_col, 'error', 'missing part number')
+    add(missing_loc, loc_col, 'error', 'missing location (row is skipped)')
+
+    # Location strings must split into the 7 components shown on the label
+    component_count = locations.str.count(r'[^_\s]+')
+    add(~missing_loc & (component_count < 7), loc_col, 'warning',
+        'location has fewer than 7 components')
+    add(component_count > 7, loc_col, 'warning',
+        'location has more than 7 components (extra ones are dropped)')
+
+    # A '<' in the part number breaks the Paragraph markup used to print it
+    add(part_nos.str.contains('<', regex=False), part_no_col, 'error',
+        'part number contains markup characters')
+
+    # Only the first part(s) at each location make it onto a label
+    parts_per_label = LABEL_LAYOUTS[layout]['parts']
+    position_in_location = df.groupby(loc_col, sort=False).cumcount()
+    add(~missing_loc & (position_in_location >= parts_per_label), loc_col, 'warning',
+        f'location already has {parts_per_label} part(s); this row is not printed')
+
+    if layout == 'v1':
+        add(descs.str.len() > DESCRIPTION_MAX_CHARS_V1, desc_col, 'warning',
+            f'description longer than {DESCRIPTION_MAX_CHARS_V1} characters is truncated')
+    else:
+        # Wrapping is only measured once per distinct description
+        results = {desc: _description_overflows_v2(desc) for desc in descs.unique()}
+        outcome = descs.map(results)
+        add(outcome == 'overflow', desc_col, 'warning',
+            'description overflows the description cell even at the smallest font size')
+        add(outcome == 'markup', desc_col, 'error', 'description contains invalid markup')
+
+    if not issues:
+        return pd.DataFrame(columns=['row', 'column', 'severity', 'problem'])
+    return pd.concat(issues, ignore_index=True).sort_values('row', kind='stable', ignore_index=True)
+
+def format_validation_report(issues, max_rows=10):
+    """Summarize validation issues as log lines, one per distinct problem."""
+    if issues.empty:
+        return ["Validation passed: no problems found"]
+
+    lines = [f"Validation found {len(issues)} problem(s):"]
+    for (severity, column, problem), group in issues.groupby(['severity', 'column', 'problem'], sort=False):
+        rows = group['row'].tolist()
+        shown = ', '.join(str(r) for r in rows[:max_rows])
+        more = f" (+{len(rows) - max_rows} more)" if len(rows) > max_rows else ""
+        lines.append(f"  {severity.upper()}: {problem} [{column}] in {len(rows)} row(s): {shown}{more}")
+    return lines
+
+def plan_label_job(df, loc_col, layout='v2', barcodes=None):
+    """Dry run: count labels and pages and estimate render time without building any flowables."""
+    label_count = int(df[loc_col].nunique())
+    labels_per_page = BARCODE_LABELS_PER_PAGE if barcodes else MAX_LABELS_PER_PAGE
+    page_count = -(-label_count // labels_per_page)
+    return {
+        'rows': len(df),
+        'labels': label_count,
+        'pages': page_count,
+        'estimated_seconds': round(label_count * SECONDS_PER_LABEL[layout]
+                                   * BARCODE_RENDER_FACTOR.get(barcodes, 1), 1),
+    }
+
+def check_label_file(excel_file_path, layout='v2', status_callback=None):
+    """
+    Read a label file, validate every row and report a dry-run plan, without rendering.
+    Returns (issues, plan), or None if the file could not be read.
+    """
+    if status_callback is None:
+        status_callback = print
 
-    # Process records by location
-    for location, group in df_grouped:
-        try:
-            # Get the first two parts for each location
-            parts = group.head(2)
-
-            if len(parts) < 2:
-                # If only one part at this location, duplicate it (or keep as is)
-                if len(parts) == 1:
-                    print(f"Only one part found for location {location}. Proceeding with single part.")
-                    part1 = parts.iloc[0]
-                    part2 = parts.iloc[0]  # Use the same part twice if needed
-                else:
-                    print(f"No parts found for location {location}. Skipping.")
-                    continue
-            else:
-                part1 = parts.iloc[0]
-                part2 = parts.iloc[1]
+    if not os.path.exists(excel_file_path):
+        status_callback(f"Error: File not found at {excel_file_path}")
+        return None
 
-            # Force a new page after every 4 labels
-            if label_count > 0 and label_count % MAX_LABELS_PER_PAGE == 0:
-                elements.append(PageBreak())
+    try:
+        df = read_label_file(excel_file_path, status_callback=status_callback)
+    except Exception as e:
+        status_callback(f"Error reading file: {e}")
+        return None
 
-            # Increment label counter
-            label_count += 1
+    part_no_col, desc_col, loc_col = detect_label_columns(df, status_callback=status_callback)
+    status_callback(f"Using columns: Part No: {part_no_col}, Description: {desc_col}, Location: {loc_col}")
+
+    issues = validate_label_data(df, part_no_col, desc_col, loc_col, layout=layout)
+    for line in format_validation_report(issues):
+        status_callback(line)
+
+    plan = plan_label_job(df, loc_col, layout=layout)
+    status_callback(f"Dry run: {plan['rows']} rows -> {plan['labels']} labels on {plan['pages']} pages, "
+                    f"estimated render time {plan['estimated_seconds']}s")
+    return issues, plan
+
+# Cell style defaults of label layouts, the same as reportlab's table cell defaults.
+# padding is (left, right, top, bottom)
+CELL_DEFAULTS = {
+    'font': 'Helvetica',
+    'size': 10,
+    'leading': 12,
+    'color': colors.black,
+    'align': 'LEFT',
+    'valign': 'BOTTOM',
+    'padding': (6, 6, 3, 3),
+    'fill': None,
+    'format': 'text',
+    'max_chars': None,
+    'fit': False,
+    'trailer': '',
+}
+
+def _part_block_v1(part, space_after):
+    """Part number and description rows of one of the two parts on a Standard (v1) label."""
+    return {
+        'columns': [4 * cm, 11 * cm],
+        'style': {'padding': (5, 5, 3, 3)},
+        'rows': [
+            (1.3 * cm, [{'text': 'Part No', 'size': 16, 'align': 'CENTER', 'valign': 'MIDDLE'},
+                        {'field': ('part_no', part), 'format': 'part_no', 'sizes': (17, 22),
+                         'style': bold_style_v1, 'font': bold_style_v1.fontName, 'valign': 'MIDDLE'}]),
+            (0.8 * cm, [{'text': 'Description', 'size': 16, 'align': 'CENTER', 'valign': 'TOP'},
+                        {'field': ('description', part), 'size': 16, 'valign': 'TOP',
+                         'max_chars': DESCRIPTION_MAX_CHARS_V1, 'fit': True}]),
+        ],
+        'space_after': space_after,
+    }
+
+def _location_block(height, value_size):
+    """Location row shared by both layouts: the caption, then the 7 components on coloured cells."""
+    widths = [w * 11 * cm / sum(LOCATION_COL_PROPORTIONS) for w in LOCATION_COL_PROPORTIONS]
+    values = [{'field': ('location', i), 'size': value_size, 'fill': color}
+              for i, color in enumerate(LOCATION_COLORS)]
+    return {
+        'columns': [4 * cm] + widths,
+        'style': {'align': 'CENTER', 'valign': 'TOP'},
+        'rows': [(height, [{'text': 'Part Location', 'size': 16}] + values)],
+    }
+
+# Declarative label layouts. A label is a stack of blocks, each a 1pt black grid with the
+# given column widths and rows of (height, cells), plus optional space below it. A cell
+# shows fixed 'text' or a 'field' of the label record: ('part_no', i) or ('description', i)
+# of the i-th part, or ('location', i) for the i-th location component. Cell styles fall
+# back to the block's 'style', then to CELL_DEFAULTS. 'format' picks how a field is drawn:
+# 'text' (plain, optionally cut at max_chars and shrunk to fit), 'part_no' (two font sizes,
+# see format_part_no) or 'wrap' (auto-fitted description, see format_description).
+LABEL_LAYOUTS = {
+    # Standard: two parts per location
+    'v1': {
+        'parts': 2,
+        'blocks': [_part_block_v1(0, 0.3 * cm), _part_block_v1(1, 0), _location_block(0.8 * cm, 14)],
+    },
+    # Enhanced: one part with a large part number and a wrapped description
+    'v2': {
+        'parts': 1,
+        'blocks': [
+            {
+                'columns': [4 * cm, 11 * cm],
+                'style': {'padding': (5, 5, 3, 3)},
+                'rows': [
+                    (1.9 * cm, [{'text': 'Part No', 'size': 16, 'align': 'CENTER', 'valign': 'MIDDLE'},
+                                {'field': ('part_no', 0), 'format': 'part_no', 'sizes': (34, 40),
+                                 'style': bold_style_v2, 'font': bold_style_v2.fontName,
+                                 'trailer': '<br/><br/>', 'align': 'CENTER',
+                                 'valign': 'TOP', 'padding': (5, 5, 10, 5)}]),
+                    (2.1 * cm, [{'text': 'Description', 'size': 16, 'align': 'CENTER', 'valign': 'MIDDLE'},
+                                {'field': ('description', 0), 'format': 'wrap', 'font': desc_style.fontName,
+                                 'size': desc_style.fontSize, 'leading': desc_style.leading,
+                                 'valign': 'MIDDLE'}]),
+                ],
+                'space_after': 0.3 * cm,
+            },
+            _location_block(0.9 * cm, 16),
+        ],
+    },
+}
+
+_ALIGN_SHIFT = {'LEFT': 0, 'CENTER': 0.5, 'CENTRE': 0.5, 'RIGHT': 1}
+_VALIGN_SHIFT = {'TOP': 0, 'MIDDLE': 0.5, 'BOTTOM': 1}
+
+class _LayoutSlot:
+    """
+    A value cell of a compiled layout: its resolved style plus anchor points. Text is placed
+    at x - width * x_shift, and y + lines * leading * y_shift - font size for the baseline;
+    a flowable's bottom left corner goes to (x - width * x_shift, y - height * (1 - y_shift)).
+    """
 
-            # Extract details for both parts
-            part_no_1 = str(part1[part_no_col])
-            desc_1 = str(part1[desc_col])
-
-            part_no_2 = str(part2[part_no_col])
-            desc_2 = str(part2[desc_col])
-
-            # Use location from the first part
-            location_str = str(part1[loc_col])
-
-            # Parse location string into components
-            location_values = parse_location_string_v1(location_str)
-
-            print(f"Creating label for location {location} with parts: {part_no_1} and {part_no_2}")
-
-            # First part table
-            part_table = Table(
-                [['Part No', format_part_no_v1(part_no_1)],
-                 ['Description', desc_1[:50]]],  # Limit length to prevent overflow
-                colWidths=[4*cm, 11*cm],
-                rowHeights=[part_no_height, desc_loc_height]
-            )
-
-            part_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'CENTRE'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),  # Part number label middle aligned
-                ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),  # Part number value middle aligned
-                ('VALIGN', (0, 1), (0, 1), 'TOP'),     # Description label top aligned
-                ('VALIGN', (1, 1), (1, 1), 'TOP'),     # Description value top aligned
-                ('LEFTPADDING', (0, 0), (-1, -1), 5),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (0, -1), 16),     # Font size for labels (left side)
-                ('FONTSIZE', (1, 1), (1, 1), 16),      # Font size for description value
-            ]))
-
-            # Second part table (with different part number)
-            part_table2 = Table(
-                [['Part No', format_part_no_v1(part_no_2)],
-                 ['Description', desc_2[:50]]],  # Limit length to prevent overflow
-                colWidths=[4*cm, 11*cm],
-                rowHeights=[part_no_height, desc_loc_height]
-            )
-
-            part_table2.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'CENTRE'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),  # Part number label middle aligned
-                ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),  # Part number value middle aligned
-                ('VALIGN', (0, 1), (0, 1), 'TOP'),     # Description label top aligned
-                ('VALIGN', (1, 1), (1, 1), 'TOP'),     # Description value top aligned
-                ('LEFTPADDING', (0, 0), (-1, -1), 5),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (0, -1), 16),     # Font size for labels (left side)
-                ('FONTSIZE', (1, 1), (1, 1), 16),      # Font size for description value
-            ]))
-
-            # Create location table with parsed location values
-            location_data = [['Part Location'] + location_values]
-
-            # Set the fixed width for the first column (e.g., "Part Location")
-            first_col_width = 4 * cm
-            location_widths = [first_col_width]
-
-            # Define total remaining width for the rest of the columns
-            remaining_width = 11 * cm  # total width available for remaining 7 columns
-
-            # Define relative proportions for the remaining 7 columns
-            # Example: more space for column like "ST-140"
-            col_proportions = [1.8, 2.7, 1.3, 1.3, 1.3, 1.3, 1.3]  # Adjust as needed
-            total_proportion = sum(col_proportions)
-
-            # Calculate actual widths based on proportions and remaining width
-            adjusted_widths = [w * remaining_width / total_proportion for w in col_proportions]
-            location_widths.extend(adjusted_widths)
-
-            location_table = Table(
-                location_data,
-                colWidths=location_widths,
-                rowHeights=desc_loc_height
-            )
-
-            location_colors = [
-                colors.HexColor('#E9967A'),  # Salmon
-                colors.HexColor('#ADD8E6'),  # Light Blue
-                colors.HexColor('#90EE90'),  # Light Green
-                colors.HexColor('#FFD700'),  # Gold
-                colors.HexColor('#ADD8E6'),  # Light Blue
-                colors.HexColor('#E9967A'),  # Salmon
-                colors.HexColor('#90EE90')   # Light Green
-            ]
-
-            location_style = [
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (0, 0), 'TOP'),       # Part Location label top aligned
-                ('VALIGN', (1, 0), (-1, 0), 'TOP'),      # Location values top aligned
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (0, 0), 16),      # Font size for Part Location label (left side)
-                ('FONTSIZE', (1, 0), (-1, -1), 14),    # Font size for location values
-            ]
-
-            for i, color in enumerate(location_colors):
-                location_style.append(('BACKGROUND', (i+1, 0), (i+1, 0), color))
-
-            location_table.setStyle(TableStyle(location_style))
-
-            elements.append(part_table)
-            elements.append(Spacer(1, 0.3 * cm))
-            elements.append(part_table2)
-            elements.append(location_table)
-            elements.append(Spacer(1, 0.2 * cm))
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
 
-            # Add spacer between labels, but not if this is the last label on the page
-            if (label_count % MAX_LABELS_PER_PAGE) < MAX_LABELS_PER_PAGE - 1 and label_count < len(df_grouped):
-                elements.append(Spacer(1, 0.2 * cm))
+class CompiledLabelLayout:
+    """
+    A layout from LABEL_LAYOUTS resolved to coordinates in points from the label's bottom left.
+    blocks holds (form_name, chrome, slots) per block in drawing order: chrome is the flat list
+    of drawing operations that is the same on every label (fills, captions, grid lines) and
+    slots the value cells. slots lists the value cells of all blocks, in the same order.
+    Blocks are drawn one after the other like stacked tables, so a value that overflows its
+    block is covered by the next block.
+    """
 
-        except Exception as e:
-            print(f"Error processing location {location}: {e}")
-            import traceback
-            traceback.print_exc()  # Print detailed stack trace for better debugging
-            continue
+    def __init__(self, name, width, height, parts, blocks):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.parts = parts
+        self.blocks = blocks
+        self.slots = [slot for _, _, block_slots in blocks for slot in block_slots]
+
+@lru_cache(maxsize=None)
+def compile_label_layout(layout):
+    """Resolve a layout spec to a CompiledLabelLayout once, so labels only replay it."""
+    if layout not in LABEL_LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}, use one of {tuple(LABEL_LAYOUTS)}")
+    spec = LABEL_LAYOUTS[layout]
+    blocks = spec['blocks']
+    width = max(sum(block['columns']) for block in blocks)
+    height = sum(sum(row_height for row_height, _ in block['rows']) + block.get('space_after', 0)
+                 for block in blocks)
+
+    compiled_blocks = []
+    block_top = height
+    for block_index, block in enumerate(blocks):
+        columns = block['columns']
+        col_x = [0]
+        for col_width in columns:
+            col_x.append(col_x[-1] + col_width)
+        row_y = [block_top]
+        for row_height, _ in block['rows']:
+            row_y.append(row_y[-1] - row_height)
+
+        # Same drawing order as a reportlab Table: backgrounds, cell text, then grid lines
+        fills = []
+        captions = []
+        slots = []
+        for (row_height, cells), row_top in zip(block['rows'], row_y):
+            for cell, x, col_width in zip(cells, col_x, columns):
+                style = {**CELL_DEFAULTS, **block.get('style', {}), **cell}
+                left, right, top, bottom = style['padding']
+                x_shift = _ALIGN_SHIFT[style['align']]
+                y_shift = _VALIGN_SHIFT[style['valign']]
+                inner_width = col_width - left - right
+                inner_height = row_height - top - bottom
+                anchor_x = x + left + inner_width * x_shift
+                anchor_y = row_top - top - inner_height * y_shift
+
+                if style['fill'] is not None:
+                    fills.append(('fill', style['fill'], x, row_top - row_height, col_width, row_height))
+                if 'field' in style:
+                    field, index = style.pop('field')
+                    slots.append(_LayoutSlot(**style, field=field, index=index, x=anchor_x, y=anchor_y,
+                                             x_shift=x_shift, y_shift=y_shift, inner_width=inner_width,
+                                             inner_height=inner_height))
+                elif style.get('text'):
+                    baseline = anchor_y + style['leading'] * y_shift - style['size']
+                    captions.append(('text', style['font'], style['size'], style['color'],
+                                     anchor_x, x_shift, baseline, style['text'], inner_width))
+
+        lines = [(col_x[0], y, col_x[-1], y) for y in row_y]
+        lines += [(x, row_y[0], x, row_y[-1]) for x in col_x]
+        chrome = fills + captions + [('grid', block.get('grid', 1), colors.black, lines)]
+        compiled_blocks.append((f'LabelChrome_{layout}_{block_index}', chrome, slots))
+        block_top = row_y[-1] - block.get('space_after', 0)
+
+    return CompiledLabelLayout(layout, width, height, spec['parts'], compiled_blocks)
+
+def _label_record(part1, part2, location_values):
+    """Field values of one label as addressed by layout cells; part1/part2 are (part_no, desc)."""
+    return {
+        'part_no': (part1[0], part2[0]),
+        'description': (part1[1], part2[1]),
+        'location': location_values,
+    }
+
+def _format_slot(slot, text):
+    """What a value cell draws for text: (string or Paragraph, font size)."""
+    if slot.format == 'part_no':
+        return format_part_no(text, slot.sizes, slot.style, slot.trailer), slot.size
+    if slot.format == 'wrap':
+        return format_description(text), slot.size
+    if slot.max_chars:
+        text = text[:slot.max_chars]
+    if slot.fit:
+        return text, fit_font_size(text, slot.font, slot.size, slot.inner_width)
+    return text, slot.size
+
+def _draw_chrome(canv, chrome):
+    """Replay the static drawing operations of a compiled layout."""
+    canv.saveState()
+    for op in chrome:
+        if op[0] == 'fill':
+            _, color, x, y, width, height = op
+            canv.setFillColor(color)
+            canv.rect(x, y, width, height, stroke=0, fill=1)
+        elif op[0] == 'text':
+            _, font, size, color, x, x_shift, y, text, _ = op
+            canv.setFillColor(color)
+            canv.setFont(font, size)
+            canv.drawString(x - text_width(text, font, size) * x_shift, y, text)
+        else:
+            _, line_width, color, lines = op
+            # Round caps and joins, like reportlab's table grid
+            canv.setLineCap(1)
+            canv.setLineJoin(1)
+            canv.setStrokeColor(color)
+            canv.setLineWidth(line_width)
+            canv.lines(lines)
+    canv.restoreState()
+
+class LabelFlowable(Flowable):
+    """
+    One label: replays a compiled layout with the formatted values of one label record
+    (a (value, font size) pair per slot). The chrome is drawn with every label, or with
+    share_chrome only once per document into a PDF form that every label references.
+    Plain-text values all go into one text object, changing font only where it changes.
+    scan_row is an optional BarcodeRowFlowable drawn right below the label as part of it,
+    so a label with barcodes is still one flowable to lay out.
+    """
 
-    if elements:
-        doc.build(elements)
-        print(f"PDF generated successfully: {output_pdf_path}")
-        return output_pdf_path
+    def __init__(self, layout, values, share_chrome=False, scan_row=None):
+        Flowable.__init__(self)
+        self.layout = layout
+        self.values = values
+        self.share_chrome = share_chrome
+        self.scan_row = scan_row
+        self.width = layout.width
+        self.height = layout.height + (scan_row.height if scan_row else 0)
+        self.hAlign = 'CENTER'
+
+    def draw(self):
+        canv = self.canv
+        if self.scan_row:
+            self.scan_row.draw_row(canv)
+            canv.translate(0, self.scan_row.height)
+        values = iter(self.values)
+        for form_name, chrome, slots in self.layout.blocks:
+            if self.share_chrome:
+                if not canv.hasForm(form_name):
+                    canv.beginForm(form_name, -2, -2, self.width + 2, self.height + 2)
+                    _draw_chrome(canv, chrome)
+                    canv.endForm()
+                canv.doForm(form_name)
+            else:
+                _draw_chrome(canv, chrome)
+            self._draw_values(slots, values)
+
+    def _draw_values(self, slots, values):
+        canv = self.canv
+        text = None
+        font = color = None
+        line_x = line_y = 0
+        for slot, (value, size) in zip(slots, values):
+            if isinstance(value, Flowable):
+                width, height = value.wrapOn(canv, slot.inner_width, slot.inner_height)
+                value.drawOn(canv, slot.x - width * slot.x_shift, slot.y - height * (1 - slot.y_shift))
+                continue
+            if not value:
+                continue
+            if text is None:
+                text = canv.beginText()
+            if font != (slot.font, size):
+                font = (slot.font, size)
+                text.setFont(slot.font, size)
+            if color != slot.color:
+                color = slot.color
+                text.setFillColor(color)
+            lines = value.split('\n')
+            y = slot.y + len(lines) * slot.leading * slot.y_shift - size
+            for line in lines:
+                x = slot.x - text_width(line, slot.font, size) * slot.x_shift
+                # Relative move from the previous value, shorter than a full text matrix
+                text.moveCursor(x - line_x, line_y - y)
+                line_x, line_y = x, y
+                text.textOut(line)
+                y -= slot.leading
+        if text is not None:
+            canv.drawText(text)
+
+# reportlab reads the global rl_config.useA85 while it writes a document, so documents
+# are written one at a time and each applies its own setting only for that step
+_pdf_save_lock = threading.Lock()
+
+class _LabelCanvas(Canvas):
+    """
+    Canvas that can write its compressed PDF streams as raw binary instead of ASCII85 text,
+    which is about 25% smaller, without changing rl_config.useA85 for other documents.
+    """
+
+    def __init__(self, *args, binary_streams=False, **kwargs):
+        Canvas.__init__(self, *args, **kwargs)
+        self._binary_streams = binary_streams
+
+    def save(self):
+        with _pdf_save_lock:
+            saved = rl_config.useA85
+            if self._binary_streams:
+                rl_config.useA85 = 0
+            try:
+                Canvas.save(self)
+            finally:
+                rl_config.useA85 = saved
+
+def _fold_spacers(elements):
+    """
+    Turn each Spacer after a Table or label row into its spaceAfter. Labels land in exactly the
+    same place, without an empty save/translate/restore in the page stream for every spacer.
+    """
+    folded = []
+    for element in elements:
+        if isinstance(element, Spacer) and folded and isinstance(folded[-1], (Table, LabelFlowable)):
+            folded[-1].spaceAfter = folded[-1].getSpaceAfter() + element.height
+        else:
+            folded.append(element)
+    return folded
+
+def _build_pdf(elements, output_pdf_path, optimize_size=False):
+    """Lay out the label flowables on A4 pages and write the PDF."""
+    if optimize_size:
+        SimpleDocTemplate(output_pdf_path, pagesize=A4, pageCompression=1).build(
+            _fold_spacers(elements), canvasmaker=partial(_LabelCanvas, binary_streams=True))
     else:
-        print("No labels were generated. Check if the Excel file has the expected columns.")
-        return None
+        SimpleDocTemplate(output_pdf_path, pagesize=A4).build(elements, canvasmaker=_LabelCanvas)
+
+def _count_labels(elements):
+    """Number of labels in a list of label flowables."""
+    return sum(1 for element in elements if isinstance(element, LabelFlowable))
 
-def generate_labels_from_excel_v2(excel_file_path, output_pdf_path, status_callback=None, progress_callback=None):
+def _output_size(output_pdf_path):
+    """Size in bytes of a written PDF, given a file path or the binary stream it was written to."""
+    if isinstance(output_pdf_path, (str, os.PathLike)):
+        return os.path.getsize(output_pdf_path)
+    return output_pdf_path.tell()
+
+def describe_pdf_size(size, labels):
+    """One-line size report for the job log."""
+    return f"PDF size: {size} bytes for {labels} labels ({size / max(labels, 1):.0f} bytes per label)"
+
+def generate_labels_from_excel_v1(excel_file_path, output_pdf_path, location_filter=None, barcodes=None,
+                                  optimize_size=False, walk='natural'):
     try:
-        if status_callback:
-            status_callback(f"Reading file: {excel_file_path}")
-        
+        print(f"Attempting to read Excel file: {excel_file_path}")
         if not os.path.exists(excel_file_path):
-            if status_callback:
-                status_callback(f"Error: File not found at {excel_file_path}")
+            print(f"Error: Excel file not found at {excel_file_path}")
             return None
 
-        # Enhanced Excel reading with various engines to improve compatibility
-        try:
-            # Check if the file is CSV or Excel
-            if excel_file_path.lower().endswith('.csv'):
-                df = pd.read_csv(excel_file_path)
-            else:
-                df = pd.read_excel(excel_file_path)
-        except Exception as first_error:
-            try:
-                if status_callback:
-                    status_callback("First attempt failed, trying with engine='openpyxl'...")
-                df = pd.read_excel(excel_file_path, engine='openpyxl')
-            except Exception as second_error:
-                try:
-                    if status_callback:
-                        status_callback("Second attempt failed, trying with engine='xlrd'...")
-                    df = pd.read_excel(excel_file_path, engine='xlrd')
-                except Exception as third_error:
-                    # Final attempt: try csv with different encodings
-                    try:
-                        df = pd.read_csv(excel_file_path, encoding='utf-8')
-                    except:
-                        df = pd.read_csv(excel_file_path, encoding='latin1')
+        df = read_label_file(excel_file_path, status_callback=print)
 
-        if status_callback:
-            status_callback(f"Successfully read file with {len(df)} rows")
-            status_callback(f"Columns found: {df.columns.tolist()}")
+        print(f"Successfully read file with {len(df)} rows")
+        print("Columns found:", df.columns.tolist())
+
+        # Display first few rows to help with debugging
+        print("\nFirst 2 rows of data:")
+        print(df.head(2))
 
     except Exception as e:
-        if status_callback:
-            status_callback(f"Error reading file: {e}")
+        print(f"Error reading file: {e}")
         return None
 
-    # Set up key measurements
-    label_width = 15 * cm
-    label_height = 5 * cm
-    part_no_height = 1.9 * cm    # Increased height for part number rows
-    desc_height = 2.1 * cm       # Height for description rows
-    loc_height = 0.9 * cm        # Height for location rows
-
-    # Identify column names in the file
-    cols = df.columns.tolist()
+    return generate_labels_from_dataframe_v1(df, output_pdf_path, location_filter=location_filter, barcodes=barcodes,
+                                             optimize_size=optimize_size, walk=walk)
 
-    # Normalize column names (convert to uppercase)
-    df.columns = [col.upper() for col in df.columns]
-    cols = df.columns.tolist()
-
-    # Standard column names to look for (case-insensitive)
-    part_no_col = next((col for col in cols if 'PART' in col and ('NO' in col or 'NUM' in col or '#' in col)),
-                      next((col for col in cols if col in ['PARTNO', 'PART']), None))
-
-    desc_col = next((col for col in cols if 'DESC' in col), None)
-    loc_col = next((col for col in cols if 'LOC' in col or 'POS' in col), None)
+def generate_labels_from_dataframe_v1(df, output_pdf_path, location_filter=None, barcodes=None, optimize_size=False,
+                                      walk='natural', status_callback=print, location_index=None):
+    """
+    Render Standard (v1) labels from a DataFrame to a file path or binary stream.
+    optimize_size writes a smaller PDF that looks the same, see LabelFlowable.
+    Progress is logged to stdout unless another status_callback (or None) is given.
+    """
+    cache_start = paragraph_cache.counters()
+    elements = build_label_elements_v1(df, location_filter=location_filter, barcodes=barcodes,
+                                       optimize_size=optimize_size, walk=walk, status_callback=status_callback,
+                                       location_index=location_index)
 
-    if not part_no_col:
+    if elements:
+        _build_pdf(elements, output_pdf_path, optimize_size=optimize_size)
         if status_callback:
-            status_callback(f"Warning: Could not find part number column in {cols}")
-        part_no_col = cols[0]  # Use first column as fallback
-
-    if not desc_col:
+            status_callback(paragraph_cache.describe(since=cache_start))
+            status_callback(describe_pdf_size(_output_size(output_pdf_path), _count_labels(elements)))
+            status_callback(f"PDF generated successfully: {output_pdf_path}")
+        return output_pdf_path
+    else:
         if status_callback:
-            status_callback(f"Warning: Could not find description column in {cols}")
-        desc_col = cols[1] if len(cols) > 1 else part_no_col  # Use second column as fallback
+            status_callback("No labels were generated. Check if the Excel file has the expected columns.")
+        return None
 
-    if not loc_col:
-        if status_callback:
-            status_callback(f"Warning: Could not find location column in {cols}")
-        loc_col = cols[2] if len(cols) > 2 else desc_col  # Use third column as fallback
+def build_label_elements(df, layout='v2', status_callback=None, progress_callback=None, location_filter=None,
+                         barcodes=None, optimize_size=False, walk='natural', location_index=None):
+    """
+    Build the flowables for labels in the given layout from a DataFrame, one label per location.
+    Every label replays the compiled layout (see compile_label_layout) with its own values.
+    barcodes ('code128' or 'qr') adds a scan row with the label's part numbers and location.
+    optimize_size shares the static parts of every label, see LabelFlowable.
+    walk orders the labels along the rack walk ('natural' or 'serpentine'), see rack_walk_order.
+    location_index is a prebuilt LocationIndex over df for location_filter, see filter_locations.
+    """
+    compiled = compile_label_layout(layout)
+
+    # Identify column names in the file
+    part_no_col, desc_col, loc_col = detect_label_columns(df, status_callback=status_callback)
 
     if status_callback:
         status_callback(f"Using columns: Part No: {part_no_col}, Description: {desc_col}, Location: {loc_col}")
 
-    # Group parts by location to create pairs
-    df_grouped = df.groupby(loc_col)
-    total_locations = len(df_grouped)
+    # Restrict to a subset of locations, e.g. {'station': 'ST-140', 'level': range(0, 3)}
+    if location_filter:
+        df = filter_locations(df, loc_col, location_filter, location_index)
+        if status_callback:
+            status_callback(f"Location filter {location_filter} matched {len(df)} rows")
+
+    # Report every data problem up front instead of one by one in the render loop
+    if status_callback:
+        issues = validate_label_data(df, part_no_col, desc_col, loc_col, layout=layout)
+        for line in format_validation_report(issues):
+            status_callback(line)
+
+    # One record per location, the first part(s) there and the parsed location components
+    records = [(location, _label_record(part1, part2, values))
+               for location, part1, part2, values in label_records(df, walk=walk)]
+
+    # Encode each distinct part number and location once, ahead of the render loop
+    labels_per_page = MAX_LABELS_PER_PAGE
+    if barcodes:
+        labels_per_page = BARCODE_LABELS_PER_PAGE
+        part_values = [str(part_no) for _, record in records for part_no in record['part_no'][:compiled.parts]]
+        location_values = [str(location) for location, _ in records]
+        part_codes, failed_parts = prepare_barcodes(part_values, barcodes)
+        location_codes, failed_locations = prepare_barcodes(location_values, barcodes)
+        if status_callback:
+            status_callback(f"Barcodes: {len(part_codes)} part numbers and {len(location_codes)} "
+                            f"locations encoded as {barcodes}")
+            if failed_parts or failed_locations:
+                status_callback(f"Warning: {failed_parts} part number(s) and {failed_locations} location(s) "
+                                f"can't be encoded as {barcodes} and get an empty scan cell")
 
-    doc = SimpleDocTemplate(output_pdf_path, pagesize=A4)
+    total_locations = len(records)
     elements = []
 
-    # Hard limit: maximum 4 labels per page (each label has 2 parts)
-    MAX_LABELS_PER_PAGE = 4
-
     # Keep track of labels for pagination
     label_count = 0
-    
-    # Process records by location
-    for i, (location, group) in enumerate(df_grouped):
+
+    for i, (location, record) in enumerate(records):
         try:
-            # Update progress
             if progress_callback:
-                progress_value = int((i / total_locations) * 100)
-                progress_callback(progress_value)
-            
+                progress_callback(int((i / total_locations) * 100))
+
             if status_callback:
                 status_callback(f"Processing location {i+1}/{total_locations}: {location}")
-                
-            # Get the first two parts for each location
-            parts = group.head(2)
-
-            if len(parts) < 2:
-                # If only one part at this location, duplicate it (or keep as is)
-                if len(parts) == 1:
-                    if status_callback:
-                        status_callback(f"Only one part found for location {location}. Proceeding with single part.")
-                    part1 = parts.iloc[0]
-                    part2 = parts.iloc[0]  # Use the same part twice if needed
-                else:
-                    if status_callback:
-                        status_callback(f"No parts found for location {location}. Skipping.")
-                    continue
-            else:
-                part1 = parts.iloc[0]
-                part2 = parts.iloc[1]
 
-            # Force a new page after every 4 labels
-            if label_count > 0 and label_count % MAX_LABELS_PER_PAGE == 0:
-                elements.append(PageBreak())
+            values = [_format_slot(slot, record[slot.field][slot.index]) for slot in compiled.slots]
 
-            # Increment label counter
+            # Force a new page after every 4 labels (3 with a scan row)
+            if label_count > 0 and label_count % labels_per_page == 0:
+                elements.append(PageBreak())
             label_count += 1
 
-            # Extract details for both parts
-            part_no = str(part1[part_no_col])
-            desc = str(part1[desc_col])
-
-            # Use location from the first part
-            location_str = str(part1[loc_col])
-
-            # Parse location string into components
-            location_values = parse_location_string_v2(location_str)
-
-            # First part table with formatted description for wrapping
-            part_table = Table(
-                [['Part No', format_part_no_v2(part_no)],
-                 ['Description', format_description(desc)]],  # Using paragraph style for wrapping
-                colWidths=[4*cm, 11*cm],
-                rowHeights=[part_no_height, desc_height]  # Using the adjusted height
-            )
-
-            part_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-                ('ALIGN', (1, 0), (1, 0), 'CENTER'),  # Center alignment for part number value
-                ('ALIGN', (1, 1), (1, -1), 'LEFT'),   # Left alignment for description
-                ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),  # Part number label middle aligned
-                ('VALIGN', (1, 0), (1, 0), 'TOP'),     # Changed to TOP alignment for part number value
-                ('VALIGN', (0, 1), (0, 1), 'MIDDLE'),     # Description label top aligned
-                ('VALIGN', (1, 1), (1, 1), 'MIDDLE'),     # Description value top aligned
-                ('LEFTPADDING', (0, 0), (-1, -1), 5),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-                ('TOPPADDING', (1, 0), (1, 0), 10),    # Added top padding to move part number up
-                ('BOTTOMPADDING', (1, 0), (1, 0), 5),  # Added bottom padding for part number
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (0, -1), 16),     # Font size for labels (left side)
-                # Note: Font size for description is now controlled by the desc_style ParagraphStyle
-            ]))
-
-            # Create location table with parsed location values - ADJUSTED WIDTHS
-            location_data = [['Part Location'] + location_values]
-
-            # Adjust column widths to prevent overlapping - give more space to the second column (ST-140)
-            # Total width: 11 cm to distribute among 7 columns
-            location_widths = [4*cm]  # First column width (Part Location)
-
-            # Distribute remaining width with more space for column with ST-140
-            remaining_width = 11 * cm
-            col_widths = [1.8, 2.7, 1.3, 1.3, 1.3, 1.3, 1.3]  # Relative width proportions
-            total_proportion = sum(col_widths)
-
-            # Calculate actual widths based on proportions
-            location_widths.extend([w * remaining_width / total_proportion for w in col_widths])
-
-            location_table = Table(
-                location_data,
-                colWidths=location_widths,
-                rowHeights=loc_height,
-            )
-
-            location_colors = [
-                colors.HexColor('#E9967A'),  # Salmon
-                colors.HexColor('#ADD8E6'),  # Light Blue
-                colors.HexColor('#90EE90'),  # Light Green
-                colors.HexColor('#FFD700'),  # Gold
-                colors.HexColor('#ADD8E6'),  # Light Blue
-                colors.HexColor('#E9967A'),  # Salmon
-                colors.HexColor('#90EE90')   # Light Green
-            ]
-
-            location_style = [
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (0, 0), 'TOP'),       # Part Location label top aligned
-                ('VALIGN', (1, 0), (-1, 0), 'TOP'),      # Location values top aligned
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (0, 0), 16),      # Font size for Part Location label (left side)
-                ('FONTSIZE', (1, 0), (-1, -1), 16),    # Font size for location values
-            ]
-
-            for i, color in enumerate(location_colors):
-                location_style.append(('BACKGROUND', (i+1, 0), (i+1, 0), color))
-
-            location_table.setStyle(TableStyle(location_style))
-
-            elements.append(part_table)
-            elements.append(Spacer(1, 0.3 * cm))
-            elements.append(location_table)
+            scan_row = None
+            if barcodes:
+                codes = [part_codes[str(part_no)] for part_no in record['part_no'][:compiled.parts]]
+                codes.append(location_codes[str(location)])
+                scan_row = BarcodeRowFlowable(codes)
+            elements.append(LabelFlowable(compiled, values, share_chrome=optimize_size, scan_row=scan_row))
             elements.append(Spacer(1, 0.2 * cm))
 
             # Add spacer between labels, but not if this is the last label on the page
-            if (label_count % MAX_LABELS_PER_PAGE) < MAX_LABELS_PER_PAGE - 1 and label_count < len(df_grouped):
+            if (label_count % labels_per_page) < labels_per_page - 1 and label_count < total_locations:
                 elements.append(Spacer(1, 0.2 * cm))
 
         except Exception as e:
@@ -636,11 +1547,60 @@ def generate_labels_from_excel_v2(excel_file_path, output_pdf_path, status_callb
     if progress_callback:
         progress_callback(100)
 
+    return elements
+
+def build_label_elements_v1(df, location_filter=None, barcodes=None, optimize_size=False, walk='natural',
+                            status_callback=print, location_index=None):
+    """Build the flowables for Standard (v1) labels from a DataFrame, logging to stdout by default."""
+    return build_label_elements(df, 'v1', status_callback=status_callback, location_filter=location_filter,
+                                barcodes=barcodes, optimize_size=optimize_size, walk=walk,
+                                location_index=location_index)
+
+def generate_labels_from_excel_v2(excel_file_path, output_pdf_path, status_callback=None, progress_callback=None,
+                                  location_filter=None, barcodes=None, optimize_size=False, walk='natural'):
+    try:
+        if status_callback:
+            status_callback(f"Reading file: {excel_file_path}")
+        
+        if not os.path.exists(excel_file_path):
+            if status_callback:
+                status_callback(f"Error: File not found at {excel_file_path}")
+            return None
+
+        df = read_label_file(excel_file_path, status_callback=status_callback)
+
+        if status_callback:
+            status_callback(f"Successfully read file with {len(df)} rows")
+            status_callback(f"Columns found: {df.columns.tolist()}")
+
+    except Exception as e:
+        if status_callback:
+            status_callback(f"Error reading file: {e}")
+        return None
+
+    return generate_labels_from_dataframe_v2(df, output_pdf_path, status_callback=status_callback,
+                                             progress_callback=progress_callback, location_filter=location_filter,
+                                             barcodes=barcodes, optimize_size=optimize_size, walk=walk)
+
+def generate_labels_from_dataframe_v2(df, output_pdf_path, status_callback=None, progress_callback=None,
+                                      location_filter=None, barcodes=None, optimize_size=False, walk='natural',
+                                      location_index=None):
+    """
+    Render Enhanced (v2) labels from a DataFrame to a file path or binary stream.
+    optimize_size writes a smaller PDF that looks the same, see LabelFlowable.
+    """
+    cache_start = paragraph_cache.counters()
+    elements = build_label_elements_v2(df, status_callback=status_callback, progress_callback=progress_callback,
+                                       location_filter=location_filter, barcodes=barcodes,
+                                       optimize_size=optimize_size, walk=walk, location_index=location_index)
+
     if elements:
         if status_callback:
             status_callback(f"Building PDF document...")
-        doc.build(elements)
+        _build_pdf(elements, output_pdf_path, optimize_size=optimize_size)
         if status_callback:
+            status_callback(paragraph_cache.describe(since=cache_start))
+            status_callback(describe_pdf_size(_output_size(output_pdf_path), _count_labels(elements)))
             status_callback(f"PDF generated successfully: {output_pdf_path}")
         return output_pdf_path
     else:
@@ -648,6 +1608,971 @@ def generate_labels_from_excel_v2(excel_file_path, output_pdf_path, status_callb
             status_callback("No labels were generated. Check if the Excel file has the expected columns.")
         return None
 
+def build_label_elements_v2(df, status_callback=None, progress_callback=None, location_filter=None, barcodes=None,
+                            optimize_size=False, walk='natural', location_index=None):
+    """Build the flowables for Enhanced (v2) labels from a DataFrame."""
+    return build_label_elements(df, 'v2', status_callback=status_callback, progress_callback=progress_callback,
+                                location_filter=location_filter, barcodes=barcodes, optimize_size=optimize_size,
+                                walk=walk, location_index=location_index)
+
+def render_labels(records, layout='v2', output=None, location_filter=None, status_callback=None, barcodes=None,
+                  optimize_size=False, walk='natural', location_index=None):
+    """
+    Render label records to PDF entirely in memory.
+    records is a DataFrame or an iterable of dicts with part number, description and
+    location fields (column names are detected the same way as for Excel files).
+    layout is 'v1' (Standard) or 'v2' (Enhanced); barcodes ('code128' or 'qr') adds a scan
+    row to each label and optimize_size writes a smaller PDF that looks the same. walk is the
+    label order, 'natural' or 'serpentine' (see rack_walk_order). status_callback receives the
+    progress messages for either layout. location_index is a LocationIndex built over the same
+    records, reused for location_filter across calls. Writes the PDF to output if it is a binary
+    stream such as BytesIO, otherwise returns the PDF as bytes.
+    """
+    if isinstance(records, pd.DataFrame):
+        # Shallow copy so detecting columns doesn't rename the caller's DataFrame
+        df = records.copy(deep=False)
+    else:
+        df = pd.DataFrame.from_records(list(records))
+    if df.empty:
+        raise ValueError("No label records given")
+    if layout not in ('v1', 'v2'):
+        raise ValueError(f"Unknown layout {layout!r}, use 'v1' or 'v2'")
+    if barcodes and barcodes not in BARCODE_SYMBOLOGIES:
+        raise ValueError(f"Unknown barcode symbology {barcodes!r}, use one of {BARCODE_SYMBOLOGIES}")
+    if walk not in WALK_ORDERS:
+        raise ValueError(f"Unknown walk order {walk!r}, use one of {WALK_ORDERS}")
+
+    stream = output if output is not None else io.BytesIO()
+    if layout == 'v1':
+        result = generate_labels_from_dataframe_v1(df, stream, location_filter=location_filter,
+                                                   barcodes=barcodes, optimize_size=optimize_size, walk=walk,
+                                                   status_callback=status_callback, location_index=location_index)
+    else:
+        result = generate_labels_from_dataframe_v2(df, stream, status_callback=status_callback,
+                                                   location_filter=location_filter, barcodes=barcodes,
+                                                   optimize_size=optimize_size, walk=walk,
+                                                   location_index=location_index)
+
+    if result is None:
+        raise ValueError("No labels were generated. Check that the data has part number, "
+                         "description and location columns.")
+    if output is None:
+        return stream.getvalue()
+    return output
+
+def benchmark_pdf_size(excel_file_path, layouts=('v2', 'v1'), barcodes=None, status_callback=None):
+    """
+    Render a label file with the default and the size-optimized output and report bytes per
+    label and render time for each. Returns a list of result dicts, or None if it can't be read.
+    """
+    if status_callback is None:
+        status_callback = print
+
+    try:
+        df = read_label_file(excel_file_path, status_callback=status_callback)
+    except Exception as e:
+        status_callback(f"Error reading file: {e}")
+        return None
+    part_no_col, desc_col, loc_col = detect_label_columns(df)
+    labels = max(int(df[loc_col].nunique()), 1)
+
+    results = []
+    for layout in layouts:
+        baseline = None
+        for optimize_size in (False, True):
+            start = time.perf_counter()
+            pdf = render_labels(df, layout=layout, barcodes=barcodes, optimize_size=optimize_size)
+            seconds = time.perf_counter() - start
+            baseline = baseline or len(pdf)
+            results.append({
+                'layout': layout,
+                'mode': 'optimized' if optimize_size else 'default',
+                'bytes': len(pdf),
+                'bytes_per_label': round(len(pdf) / labels, 1),
+                'seconds': round(seconds, 2),
+            })
+            status_callback(f"{layout} {results[-1]['mode']:>9}: {len(pdf):>9} bytes, "
+                            f"{len(pdf) / labels:7.0f} bytes/label, {seconds:6.2f}s "
+                            f"({100.0 * len(pdf) / baseline:.0f}% of default)")
+    return results
+
+class _SectionBookmark(Flowable):
+    """Zero-size flowable that adds a PDF outline entry where a section (e.g. a sheet) starts."""
+
+    def __init__(self, title):
+        Flowable.__init__(self)
+        self.title = title
+        self.key = f"section-{id(self)}"
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=0)
+
+def _render_sheet(df, layout, barcodes=None, walk='natural'):
+    """Process pool worker: render one sheet to PDF bytes. Raises ValueError if it has no labels."""
+    return render_labels(df, layout=layout, barcodes=barcodes, walk=walk)
+
+def generate_labels_from_workbook(excel_file_path, output_pdf_path, layout='v2', combined=True,
+                                  workers=None, status_callback=None, progress_callback=None, barcodes=None,
+                                  walk='natural'):
+    """
+    Render labels for every sheet of a workbook (one sheet per line).
+    The workbook is read once, then column detection and rendering run per sheet in a
+    process pool. With combined=True the sheets become bookmarked sections of one PDF;
+    otherwise each sheet is written to its own <output>_<sheet>.pdf.
+    Returns the list of PDF paths written (empty if no labels were generated).
+    """
+    if status_callback is None:
+        status_callback = print
+
+    try:
+        if excel_file_path.lower().endswith('.csv'):
+            sheets = {'Sheet1': read_label_file(excel_file_path, status_callback=status_callback)}
+        else:
+            # One read of the workbook for all sheets
+            sheets = pd.read_excel(excel_file_path, sheet_name=None)
+    except Exception as e:
+        status_callback(f"Error reading file: {e}")
+        return []
+
+    sheets = {name: df for name, df in sheets.items() if not df.empty}
+    status_callback(f"Read {len(sheets)} non-empty sheet(s): {list(sheets)}")
+    if not sheets:
+        return []
+
+    # Without pypdf the combined PDF has to be built in this process
+    if combined and PdfWriter is None:
+        status_callback("pypdf is not installed; building the combined PDF in a single process "
+                        "(pip install pypdf to render the sheets in parallel)")
+        return _generate_combined_workbook(sheets, output_pdf_path, layout, status_callback, barcodes=barcodes,
+                                           walk=walk)
+
+    rendered = {}
+    workers = min(workers or os.cpu_count() or 1, len(sheets))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker) as pool:
+        futures = {pool.submit(_render_sheet, df, layout, barcodes, walk): name for name, df in sheets.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            try:
+                rendered[name] = future.result()
+            except ValueError as e:
+                # Report why this sheet has no labels and carry on with the others
+                rendered[name] = None
+                status_callback(f"Sheet '{name}': no labels generated: {e}")
+            else:
+                status_callback(f"Sheet '{name}': rendered ({len(rendered[name])} bytes)")
+            if progress_callback:
+                progress_callback(int(done / len(sheets) * 100))
+
+    if combined:
+        writer = PdfWriter()
+        for name in sheets:  # Keep workbook sheet order
+            if rendered[name] is None:
+                continue
+            first_page = len(writer.pages)
+            writer.append(io.BytesIO(rendered[name]))
+            writer.add_outline_item(name, first_page)
+        if not writer.pages:
+            return []
+        with open(output_pdf_path, 'wb') as f:
+            writer.write(f)
+        status_callback(f"PDF generated successfully: {output_pdf_path}")
+        return [output_pdf_path]
+
+    base = os.path.splitext(output_pdf_path)[0]
+    paths = []
+    for name in sheets:
+        if rendered[name] is None:
+            continue
+        safe_name = re.sub(r'[^\w.-]+', '_', name)
+        path = f"{base}_{safe_name}.pdf"
+        with open(path, 'wb') as f:
+            f.write(rendered[name])
+        status_callback(f"PDF generated successfully: {path}")
+        paths.append(path)
+    return paths
+
+def _generate_combined_workbook(sheets, output_pdf_path, layout, status_callback, barcodes=None, walk='natural'):
+    """Build all sheets as bookmarked sections of one PDF in the current process."""
+    elements = []
+    for name, df in sheets.items():
+        if layout == 'v1':
+            sheet_elements = build_label_elements_v1(df, barcodes=barcodes, walk=walk, status_callback=None)
+        else:
+            sheet_elements = build_label_elements_v2(df, barcodes=barcodes, walk=walk, status_callback=None)
+        if not sheet_elements:
+            status_callback(f"Sheet '{name}': no labels generated")
+            continue
+        if elements:
+            elements.append(PageBreak())
+        elements.append(_SectionBookmark(name))
+        elements.extend(sheet_elements)
+        status_callback(f"Sheet '{name}': prepared")
+
+    if not elements:
+        return []
+    _build_pdf(elements, output_pdf_path)
+    status_callback(f"PDF generated successfully: {output_pdf_path}")
+    return [output_pdf_path]
+
+# Leading location components that make up a shard key for generate_labels_by_zone
+SHARD_LEVELS = {'zone': 1, 'station': 2}
+
+def _render_shard(df, layout, barcodes, optimize_size, walk, path):
+    """Process pool worker: render one shard and write it to path. Returns the file size, or None."""
+    try:
+        pdf = render_labels(df, layout=layout, barcodes=barcodes, optimize_size=optimize_size, walk=walk)
+    except ValueError:
+        return None
+    # Write under a temporary name so a spooler watching the folder never picks up a partial file
+    with open(path + '.part', 'wb') as f:
+        f.write(pdf)
+    os.replace(path + '.part', path)
+    return len(pdf)
+
+def generate_labels_by_zone(excel_file_path, output_dir=None, layout='v2', shard_by='zone', workers=None,
+                            barcodes=None, optimize_size=False, walk='natural', status_callback=None,
+                            progress_callback=None):
+    """
+    Split a plant-wide job into one PDF per zone (shard_by='zone') or per zone and station
+    (shard_by='station'), taken from the leading parse_location_string_v2 components.
+    Shards render concurrently in a process pool, largest first, and each file is written as
+    soon as it is ready so that zone's printer can start on it. <input>_manifest.json lists
+    every shard with its file, label count, page count and size. Shards are listed and their
+    labels ordered along the rack walk, see rack_walk_order.
+    Returns the manifest as a dict, or None if no labels were generated.
+    """
+    if status_callback is None:
+        status_callback = print
+    if shard_by not in SHARD_LEVELS:
+        raise ValueError(f"Unknown shard_by {shard_by!r}, use one of {list(SHARD_LEVELS)}")
+
+    try:
+        df = read_label_file(excel_file_path, status_callback=status_callback)
+    except Exception as e:
+        status_callback(f"Error reading file: {e}")
+        return None
+
+    part_no_col, desc_col, loc_col = detect_label_columns(df, status_callback=status_callback)
+    status_callback(f"Using columns: Part No: {part_no_col}, Description: {desc_col}, Location: {loc_col}")
+
+    # Shard key per row, e.g. "12M" or "12M_ST-140"
+    components = split_location_components(df[loc_col])
+    keys = components[LOCATION_COMPONENTS[0]]
+    for component in LOCATION_COMPONENTS[1:SHARD_LEVELS[shard_by]]:
+        keys = keys.str.cat(components[component], sep='_')
+    keys = keys.str.strip('_').replace('', 'UNASSIGNED')
+    groups = df.groupby(keys, sort=False).indices
+    shards = {key: df.iloc[groups[key]] for key in sorted(groups, key=_natural_key)}
+    status_callback(f"Split {len(df)} rows into {len(shards)} {shard_by} shard(s): {list(shards)}")
+
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(excel_file_path))
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(excel_file_path))[0]
+    paths = {}
+    for key in shards:
+        safe_key = re.sub(r'[^\w.-]+', '_', key)
+        paths[key] = os.path.join(output_dir, f"{base}_{safe_key}.pdf")
+
+    entries = {}
+    workers = min(workers or os.cpu_count() or 1, len(shards)) or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker) as pool:
+        # Largest shards first so the pool doesn't end waiting on one big zone
+        order = sorted(shards, key=lambda key: len(shards[key]), reverse=True)
+        futures = {pool.submit(_render_shard, shards[key], layout, barcodes, optimize_size, walk, paths[key]): key
+                   for key in order}
+        for done, future in enumerate(as_completed(futures), 1):
+            key = futures[future]
+            size = future.result()
+            if size is None:
+                status_callback(f"{shard_by.capitalize()} {key}: no labels generated")
+            else:
+                plan = plan_label_job(shards[key], loc_col, layout=layout, barcodes=barcodes)
+                entries[key] = {
+                    shard_by: key,
+                    'file': os.path.basename(paths[key]),
+                    'rows': plan['rows'],
+                    'labels': plan['labels'],
+                    'pages': plan['pages'],
+                    'bytes': size,
+                }
+                status_callback(f"{shard_by.capitalize()} {key}: {plan['labels']} labels on {plan['pages']} "
+                                f"pages written to {paths[key]} ({size} bytes)")
+            if progress_callback:
+                progress_callback(int(done / len(shards) * 100))
+
+    if not entries:
+        status_callback("No labels were generated. Check if the Excel file has the expected columns.")
+        return None
+
+    manifest = {
+        'source': os.path.abspath(excel_file_path),
+        'layout': layout,
+        'shard_by': shard_by,
+        'walk': walk,
+        'generated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'shards': [entries[key] for key in shards if key in entries],
+        'total_labels': sum(entry['labels'] for entry in entries.values()),
+        'total_pages': sum(entry['pages'] for entry in entries.values()),
+        'total_bytes': sum(entry['bytes'] for entry in entries.values()),
+    }
+    manifest_path = os.path.join(output_dir, f"{base}_manifest.json")
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    status_callback(f"Manifest written: {manifest_path}")
+    return manifest
+
+# Pillow stand-ins for the PDF fonts; the Vera fonts ship with reportlab
+RASTER_FONT_FILES = {
+    'Helvetica': os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'Vera.ttf'),
+    'Helvetica-Bold': os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'VeraBd.ttf'),
+}
+
+# Bump when the raster drawing changes so content hashes invalidate existing images
+RASTER_FORMAT_VERSION = 3
+
+@lru_cache(maxsize=256)
+def _raster_font(font_name, size_px):
+    return ImageFont.truetype(RASTER_FONT_FILES[font_name], max(1, int(round(size_px))))
+
+def _raster_color(color):
+    return tuple(int(round(c * 255)) for c in color.rgb())
+
+def _draw_slot_text(draw, slot, text, scale, label_height):
+    """Draw the value of one cell, shrinking it to fit the cell like the PDF auto-fit does."""
+    if not text:
+        return
+    width = slot.inner_width * scale
+    anchor_x = slot.x * scale
+    anchor_y = (label_height - slot.y) * scale
+
+    if slot.format == 'part_no':
+        size1, size2 = slot.sizes
+        part1, part2 = (text[:-5], text[-5:]) if len(text) > 5 else (text, '')
+        font1 = _raster_font(slot.font, size1 * scale)
+        font2 = _raster_font(slot.font, size2 * scale)
+        total = font1.getlength(part1) + font2.getlength(part2)
+        if total > width:
+            ratio = width / total
+            font1 = _raster_font(slot.font, size1 * scale * ratio)
+            font2 = _raster_font(slot.font, size2 * scale * ratio)
+            size2 = size2 * ratio
+        # The part number Paragraph spans the whole cell and is left aligned
+        left = anchor_x - width * slot.x_shift
+        if slot.y_shift == 0:
+            baseline = anchor_y + size2 * scale * 0.9
+        else:
+            baseline = anchor_y + size2 * scale * 0.35
+        draw.text((left, baseline), part1, font=font1, fill='black', anchor='ls')
+        draw.text((left + font1.getlength(part1), baseline), part2, font=font2, fill='black', anchor='ls')
+        return
+
+    if slot.format == 'wrap':
+        size = slot.size
+        while True:
+            font = _raster_font(slot.font, size * scale)
+            lines = []
+            for word in text.split():
+                if lines and font.getlength(lines[-1] + ' ' + word) <= width:
+                    lines[-1] += ' ' + word
+                else:
+                    lines.append(word)
+            leading = slot.leading * size / slot.size * scale
+            if (len(lines) * leading <= slot.inner_height * scale and
+                    all(font.getlength(line) <= width for line in lines)) or size <= MIN_FONT_SIZE:
+                break
+            size -= 1
+        left = anchor_x - width * slot.x_shift
+        y = anchor_y - len(lines) * leading * slot.y_shift + leading * 0.8
+        for line in lines:
+            draw.text((left, y), line, font=font, fill='black', anchor='ls')
+            y += leading
+        return
+
+    if slot.max_chars:
+        text = text[:slot.max_chars]
+    lines = text.split('\n')
+    size = slot.size
+    font = _raster_font(slot.font, size * scale)
+    widest = max(font.getlength(line) for line in lines)
+    if widest > width:
+        size = max(MIN_FONT_SIZE, size * width / widest)
+        font = _raster_font(slot.font, size * scale)
+    baseline = anchor_y - (len(lines) * slot.leading * slot.y_shift - size) * scale
+    for line in lines:
+        draw.text((anchor_x - font.getlength(line) * slot.x_shift, baseline), line, font=font,
+                  fill=_raster_color(slot.color), anchor='ls')
+        baseline += slot.leading * scale
+
+def _rasterize_chrome(draw, chrome, scale, label_height):
+    """Replay the static drawing operations of a compiled layout with Pillow."""
+    def point(x, y):
+        return x * scale, (label_height - y) * scale
+
+    for op in chrome:
+        if op[0] == 'fill':
+            _, color, x, y, width, height = op
+            draw.rectangle([point(x, y + height), point(x + width, y)], fill=_raster_color(color))
+        elif op[0] == 'text':
+            _, font_name, size, color, x, x_shift, y, text, max_width = op
+            font = _raster_font(font_name, size * scale)
+            if font.getlength(text) > max_width * scale:
+                font = _raster_font(font_name, size * scale * max_width * scale / font.getlength(text))
+            draw.text((x * scale - font.getlength(text) * x_shift, (label_height - y) * scale), text,
+                      font=font, fill=_raster_color(color), anchor='ls')
+        else:
+            _, line_width, color, lines = op
+            for x0, y0, x1, y1 in lines:
+                draw.line([point(x0, y0), point(x1, y1)], fill=_raster_color(color),
+                          width=max(1, int(round(line_width * scale))))
+
+def rasterize_label(layout, part1, part2, location_values, dpi=200):
+    """Draw one label as a PIL image at the given resolution by replaying its compiled layout."""
+    compiled = compile_label_layout(layout)
+    scale = dpi / 72.0
+    label_height = compiled.height
+    image = Image.new('RGB', (int(math.ceil(compiled.width * scale)) + 1, int(math.ceil(label_height * scale)) + 1),
+                      'white')
+    draw = ImageDraw.Draw(image)
+
+    record = _label_record(part1, part2, location_values)
+    for _, chrome, slots in compiled.blocks:
+        _rasterize_chrome(draw, chrome, scale, label_height)
+        for slot in slots:
+            _draw_slot_text(draw, slot, record[slot.field][slot.index], scale, label_height)
+    return image
+
+def label_records(df, location_filter=None, walk='natural', location_index=None):
+    """
+    Reduce a label DataFrame to one record per location without building any flowables:
+    [(location, (part_no, desc), (part_no, desc), location_values)], in walk order (see
+    rack_walk_order). A location with a single part repeats it as the second part.
+    location_index is a prebuilt LocationIndex over df for location_filter, see filter_locations.
+    """
+    df = df.copy(deep=False)
+    part_no_col, desc_col, loc_col = detect_label_columns(df)
+    if location_filter:
+        df = filter_locations(df, loc_col, location_filter, location_index)
+
+    df = df[df[loc_col].notna()]
+    position = df.groupby(loc_col, sort=False).cumcount()
+    first = df[position == 0].set_index(loc_col)
+    components = split_location_components(pd.Series(first.index.astype(str)))
+    order = rack_walk_order(components, walk)
+    first = first.iloc[order]
+    components = components.iloc[order]
+    has_second = first.index.isin(df.loc[position == 1, loc_col])
+    second = df[position == 1].set_index(loc_col).reindex(first.index)
+
+    part_no_1 = first[part_no_col].astype(str)
+    desc_1 = first[desc_col].astype(str)
+    part_no_2 = second[part_no_col].astype(str).where(has_second, part_no_1)
+    desc_2 = second[desc_col].astype(str).where(has_second, desc_1)
+
+    return [
+        (location, (p1, d1), (p2, d2), list(values))
+        for location, p1, d1, p2, d2, values in zip(
+            first.index, part_no_1, desc_1, part_no_2, desc_2, components.itertuples(index=False))
+    ]
+
+def _rasterize_chunk(jobs, layout, dpi):
+    """Process pool worker: rasterize and save a batch of labels. jobs is [(path, part1, part2, values)]."""
+    for path, part1, part2, values in jobs:
+        image = rasterize_label(layout, part1, part2, values, dpi=dpi)
+        # A label has a handful of flat colours plus anti-aliasing, so a 64-colour palette
+        # and a fast zlib level halve both the encode time and the file size
+        image = image.quantize(64, method=Image.Quantize.FASTOCTREE)
+        image.save(path, dpi=(dpi, dpi), compress_level=1)
+    return len(jobs)
+
+def export_label_images(source, output_dir, layout='v2', dpi=200, workers=None, location_filter=None,
+                        status_callback=None, location_index=None):
+    """
+    Export one PNG per location for digital bin displays (e-ink/LCD).
+    source is a spreadsheet path or a DataFrame. Files are named after the location string.
+    location_index is a prebuilt LocationIndex over a DataFrame source, see filter_locations.
+    Every image is keyed by a hash of its content, so labels that haven't changed since the
+    last export into output_dir are not rasterized again. Rasterizing runs on a process pool.
+    Returns {'written': [...], 'unchanged': count}.
+    """
+    if status_callback is None:
+        status_callback = print
+
+    if isinstance(source, (str, os.PathLike)):
+        df = read_label_file(os.fspath(source), status_callback=status_callback)
+    else:
+        df = source
+    records = label_records(df, location_filter=location_filter, location_index=location_index)
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, '.label_images.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    jobs = []
+    new_manifest = {}
+    used_names = set()
+    for location, part1, part2, values in records:
+        name = re.sub(r'[^\w.-]+', '_', str(location)).strip('_') or 'label'
+        while name in used_names:
+            name += '_'
+        used_names.add(name)
+        filename = name + '.png'
+
+        content = json.dumps([RASTER_FORMAT_VERSION, layout, dpi, part1, part2, values])
+        digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        new_manifest[filename] = digest
+        path = os.path.join(output_dir, filename)
+        if manifest.get(filename) != digest or not os.path.exists(path):
+            jobs.append((path, part1, part2, values))
+
+    unchanged = len(records) - len(jobs)
+    status_callback(f"{len(records)} labels: {len(jobs)} to rasterize, {unchanged} unchanged")
+
+    if jobs:
+        chunk_size = 64
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        workers = min(workers or os.cpu_count() or 1, len(chunks))
+        if workers == 1:
+            for chunk in chunks:
+                _rasterize_chunk(chunk, layout, dpi)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for future in as_completed([pool.submit(_rasterize_chunk, chunk, layout, dpi) for chunk in chunks]):
+                    future.result()
+
+    with open(manifest_path, 'w') as f:
+        json.dump(new_manifest, f)
+    status_callback(f"Wrote {len(jobs)} PNG file(s) to {output_dir}")
+    return {'written': [job[0] for job in jobs], 'unchanged': unchanged}
+
+# GUI preview: rows read from the file, labels shown and their resolution
+PREVIEW_ROWS = 200
+PREVIEW_LABELS = 4
+PREVIEW_DPI = 60
+
+def preview_labels(file_path, layout='v2', labels=PREVIEW_LABELS, dpi=PREVIEW_DPI, walk='natural'):
+    """
+    Low-resolution preview of the first labels of a spreadsheet, to check the detected columns
+    before a full run. Only the first PREVIEW_ROWS rows are read, so it takes a fraction of a
+    second regardless of file size. Returns (image, columns): a PIL image with the labels
+    stacked top to bottom and the detected (part number, description, location) columns.
+    walk is the label order, see rack_walk_order.
+    """
+    df = read_label_file(file_path, nrows=PREVIEW_ROWS)
+    columns = detect_label_columns(df)
+    records = label_records(df, walk=walk)[:labels]
+    if not records:
+        raise ValueError(f"No labels found in the first {PREVIEW_ROWS} rows")
+
+    images = [rasterize_label(layout, part1, part2, values, dpi=dpi) for _, part1, part2, values in records]
+    gap = max(1, int(round(0.4 * cm * dpi / 72.0)))
+    sheet = Image.new('RGB', (max(image.width for image in images),
+                              sum(image.height for image in images) + gap * (len(images) - 1)), 'white')
+    y = 0
+    for image in images:
+        sheet.paste(image, (0, y))
+        y += image.height + gap
+    return sheet, columns
+
+# Largest request body the label service accepts
+SERVICE_MAX_BODY = 50 * 1024 * 1024
+# Seconds a client gets to send the request head, and again to send the body
+SERVICE_READ_TIMEOUT = 60
+
+_HTTP_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    408: 'Request Timeout',
+    413: 'Payload Too Large',
+    422: 'Unprocessable Entity',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+def _warm_worker():
+    """Process pool initializer: load fonts, styles and the paragraph parser before the first request."""
+    df = pd.DataFrame({'Part No': ['WARMUP-12345'], 'Description': ['WARM UP'], 'Location': ['A_B_C_D_E_F_G']})
+    SimpleDocTemplate(io.BytesIO(), pagesize=A4).build(build_label_elements(df, 'v2'))
+
+def _render_request(body, content_type, layout, barcodes=None, walk='natural'):
+    """Process pool worker: render one request body (spreadsheet or JSON records) to PDF bytes."""
+    if 'json' in content_type:
+        records = json.loads(body)
+        if isinstance(records, dict):
+            records = records.get('records', [])
+        if not records:
+            raise ValueError("No label records in request")
+        df = pd.DataFrame.from_records(records)
+    elif 'csv' in content_type:
+        df = pd.read_csv(io.BytesIO(body))
+    else:
+        # read_excel tells xls and xlsx apart from the content itself
+        df = pd.read_excel(io.BytesIO(body))
+    return render_labels(df, layout=layout, barcodes=barcodes, walk=walk)
+
+class LabelService:
+    """
+    Small local HTTP service around the label generators.
+    An asyncio front end accepts requests and hands rendering to a pre-warmed process
+    pool, so pandas and reportlab are loaded once instead of on every launch.
+
+        POST /labels?layout=v2[&barcodes=qr][&walk=serpentine]   body: xlsx/xls/csv upload or JSON label records
+        GET  /health
+
+    Example:
+        curl --data-binary @plant.xlsx http://127.0.0.1:8765/labels?layout=v1 -o labels.pdf
+        curl -H "Content-Type: application/json" -d '[{"part_no": "P1", "description": "BOLT",
+             "location": "12M_ST-140_R_0_2_A_1"}]' http://127.0.0.1:8765/labels -o labels.pdf
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, workers=None, max_queue=16):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self.pool = None
+        self.server = None
+
+    async def start(self):
+        """Start and warm the worker pool, then start listening. Returns the asyncio server."""
+        loop = asyncio.get_running_loop()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # Start every worker now so the first requests don't pay the import cost
+        await asyncio.gather(*[loop.run_in_executor(self.pool, os.getpid) for _ in range(self.workers)])
+
+        # At most one job per worker renders at a time; up to max_queue more wait for a slot
+        self._slots = asyncio.Semaphore(self.workers)
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.pool.shutdown()
+
+    async def _read_head(self, reader):
+        """Read the request line and headers. Returns (method, target, headers), or None if the client sent nothing."""
+        request_line = (await reader.readline()).decode('latin1')
+        if not request_line.strip():
+            return None
+        method, target, _ = request_line.split(' ', 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return method, target, headers
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(self._read_head(reader), SERVICE_READ_TIMEOUT)
+            if head is None:
+                return
+            method, target, headers = head
+
+            url = urllib.parse.urlsplit(target)
+            query = urllib.parse.parse_qs(url.query)
+
+            if url.path == '/health':
+                status = {'status': 'ok', 'workers': self.workers, 'active': self.active, 'queued': self.queued}
+                await self._send(writer, 200, json.dumps(status).encode(), 'application/json')
+            elif url.path != '/labels':
+                await self._send_error(writer, 404, f"Unknown path {url.path}")
+            elif method != 'POST':
+                await self._send_error(writer, 405, "Use POST to request labels")
+            else:
+                await self._handle_labels(reader, writer, headers, query)
+        except asyncio.TimeoutError:
+            await self._send_error(writer, 408, f"Request not received within {SERVICE_READ_TIMEOUT} seconds")
+        except asyncio.IncompleteReadError:
+            await self._send_error(writer, 400, "Request body shorter than its Content-Length")
+        except Exception as e:
+            await self._send_error(writer, 500, str(e))
+        finally:
+            writer.close()
+
+    async def _handle_labels(self, reader, writer, headers, query):
+        layout = query.get('layout', ['v2'])[0]
+        if layout not in ('v1', 'v2'):
+            await self._send_error(writer, 400, f"Unknown layout {layout!r}, use v1 or v2")
+            return
+        barcodes = query.get('barcodes', [None])[0]
+        if barcodes and barcodes not in BARCODE_SYMBOLOGIES:
+            await self._send_error(writer, 400, f"Unknown barcodes {barcodes!r}, use code128 or qr")
+            return
+        walk = query.get('walk', ['natural'])[0]
+        if walk not in WALK_ORDERS:
+            await self._send_error(writer, 400, f"Unknown walk {walk!r}, use natural or serpentine")
+            return
+
+        length = int(headers.get('content-length', 0))
+        if length > SERVICE_MAX_BODY:
+            await self._send_error(writer, 413, f"Request body larger than {SERVICE_MAX_BODY} bytes")
+            return
+        if not length:
+            await self._send_error(writer, 400, "Empty request body")
+            return
+
+        # Turn the request away before reading a body that could be up to SERVICE_MAX_BODY;
+        # a request still uploading already holds its place in the queue
+        if self.active + self.queued >= self.workers + self.max_queue:
+            await self._send_error(writer, 503, "Too many queued requests, try again later",
+                                   extra_headers={'Retry-After': '5'})
+            return
+
+        self.queued += 1
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), SERVICE_READ_TIMEOUT)
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            pdf = await loop.run_in_executor(
+                self.pool, _render_request, body, headers.get('content-type', ''), layout, barcodes, walk)
+        except ValueError as e:
+            await self._send_error(writer, 422, str(e))
+            return
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+        await self._send(writer, 200, pdf, 'application/pdf',
+                         extra_headers={'Content-Disposition': 'attachment; filename="labels.pdf"'})
+
+    async def _send(self, writer, status, body, content_type, extra_headers=None):
+        """Write a response, streaming the body in chunks."""
+        head = [f"HTTP/1.1 {status} {_HTTP_REASONS[status]}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}",
+                "Connection: close"]
+        for name, value in (extra_headers or {}).items():
+            head.append(f"{name}: {value}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin1'))
+
+        chunk_size = 64 * 1024
+        for start in range(0, len(body), chunk_size):
+            writer.write(body[start:start + chunk_size])
+            await writer.drain()
+        await writer.drain()
+
+    async def _send_error(self, writer, status, message, extra_headers=None):
+        await self._send(writer, status, json.dumps({'error': message}).encode(),
+                         'application/json', extra_headers=extra_headers)
+
+def serve_labels(host='127.0.0.1', port=8765, workers=None, max_queue=16):
+    """Run the label service until interrupted."""
+    async def run():
+        service = LabelService(host, port, workers, max_queue)
+        server = await service.start()
+        print(f"Label service listening on http://{service.host}:{service.port} "
+              f"with {service.workers} workers")
+        try:
+            await server.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Label service stopped")
+
+# File types picked up by the watch-folder daemon
+WATCH_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+def location_row_hashes(df, part_no_col, desc_col, loc_col):
+    """
+    Hash the label-relevant rows of every location in one vectorized pass.
+    Returns {location: hash}; the hash changes when any row at the location changes or moves.
+    """
+    df = df[df[loc_col].notna()]
+    locations = df[loc_col].astype(str)
+    rows = df[[part_no_col, desc_col, loc_col]].astype(str)
+    row_hash = pd.util.hash_pandas_object(rows, index=False).to_numpy(dtype=np.uint64)
+
+    # Weight each row by its position within the location so reordering parts counts as a change
+    position = df.groupby(locations, sort=False).cumcount().to_numpy(dtype=np.uint64) + np.uint64(1)
+    weighted = pd.Series(row_hash * position, index=df.index)  # wraps around modulo 2**64
+    return {loc: int(h) for loc, h in weighted.groupby(locations, sort=False).sum().items()}
+
+def _regenerate_labels(file_path, previous_hashes, layout, output_dir):
+    """
+    Process pool worker: render labels for one watched file.
+    The first time a file is seen every location is rendered; after that only the
+    locations whose rows changed go into a separate "_changes" PDF.
+    """
+    df = read_label_file(file_path)
+    part_no_col, desc_col, loc_col = detect_label_columns(df)
+    hashes = location_row_hashes(df, part_no_col, desc_col, loc_col)
+
+    if previous_hashes is None:
+        changed = list(hashes)
+    else:
+        changed = [loc for loc, h in hashes.items() if previous_hashes.get(loc) != h]
+    removed = 0 if previous_hashes is None else len(set(previous_hashes) - set(hashes))
+
+    output_path = None
+    if changed:
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        suffix = '_enhanced' if layout == 'v2' else '_standard'
+        if previous_hashes is None:
+            subset = df
+            output_path = os.path.join(output_dir, f"{stem}{suffix}.pdf")
+        else:
+            subset = df[df[loc_col].astype(str).isin(changed)]
+            output_path = os.path.join(output_dir, f"{stem}{suffix}_changes_{time.strftime('%Y%m%d-%H%M%S')}.pdf")
+        with open(output_path, 'wb') as f:
+            render_labels(subset, layout=layout, output=f)
+
+    return {'hashes': hashes, 'changed': len(changed), 'removed': removed, 'output': output_path}
+
+class _InotifyWatcher:
+    """Wakes up as soon as a file in the folder is written or moved in (Linux only)."""
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {folder}")
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            # The events themselves don't matter, the folder is rescanned after every wake-up
+            try:
+                while os.read(self.fd, 64 * 1024):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+class _PollingWatcher:
+    """Fallback for platforms without inotify: just wake up every timeout seconds."""
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+
+    def close(self):
+        pass
+
+def _scan_label_files(folder):
+    """Return {path: (mtime_ns, size)} for every spreadsheet in folder, skipping lock/temp files."""
+    files = {}
+    for entry in os.scandir(folder):
+        name = entry.name
+        if name.startswith(('~$', '.')) or not name.lower().endswith(WATCH_EXTENSIONS):
+            continue
+        if entry.is_file():
+            stat = entry.stat()
+            files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+def watch_folder(folder, layout='v2', output_dir=None, workers=None, debounce=2.0, poll_interval=1.0):
+    """
+    Watch folder for new or changed spreadsheets and regenerate their labels.
+    A file is only processed once its size and modification time have been stable for
+    debounce seconds, so half-written files are skipped. Per-location row hashes are kept
+    in a state file in output_dir, so after a change only the locations whose rows
+    changed are rendered, also across restarts.
+    """
+    folder = os.path.abspath(folder)
+    output_dir = os.path.abspath(output_dir or folder)
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, '.label_watch_state.json')
+
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    try:
+        watcher = _InotifyWatcher(folder)
+        print(f"Watching {folder} with inotify")
+    except (OSError, AttributeError, TypeError):
+        watcher = _PollingWatcher()
+        print(f"Watching {folder} by polling every {poll_interval}s")
+
+    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_warm_worker)
+    pending = {}  # path -> (signature, time the signature was first seen)
+    running = {}  # path -> (future, signature)
+
+    try:
+        while True:
+            watcher.wait(min(poll_interval, debounce))
+            now = time.monotonic()
+
+            for path, signature in _scan_label_files(folder).items():
+                if path in running or state.get(path, {}).get('signature') == list(signature):
+                    continue
+                seen = pending.get(path)
+                if seen is None or seen[0] != signature:
+                    pending[path] = (signature, now)  # still being written, restart the debounce timer
+                elif now - seen[1] >= debounce:
+                    del pending[path]
+                    previous = state.get(path, {}).get('hashes')
+                    print(f"Change detected in {os.path.basename(path)}, regenerating labels...")
+                    future = pool.submit(_regenerate_labels, path, previous, layout, output_dir)
+                    running[path] = (future, signature)
+
+            for path, (future, signature) in list(running.items()):
+                if not future.done():
+                    continue
+                del running[path]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error processing {os.path.basename(path)}: {e}")
+                    # Remember the signature anyway so a broken file isn't retried until it changes
+                    state[path] = {'signature': list(signature), 'hashes': state.get(path, {}).get('hashes')}
+                else:
+                    state[path] = {'signature': list(signature), 'hashes': result['hashes']}
+                    if result['output']:
+                        print(f"{os.path.basename(path)}: {result['changed']} location(s) changed, "
+                              f"{result['removed']} removed -> {result['output']}")
+                    else:
+                        print(f"{os.path.basename(path)}: no label changes "
+                              f"({result['removed']} location(s) removed)")
+                with open(state_path, 'w') as f:
+                    json.dump(state, f)
+    except KeyboardInterrupt:
+        print("Watcher stopped")
+    finally:
+        watcher.close()
+        pool.shutdown(cancel_futures=True)
+
+# Barcode choices shown in the GUI, mapped to the generators' barcodes= argument
+BARCODE_CHOICES = {'No barcodes': None, 'Code128': 'code128', 'QR code': 'qr'}
+# Label order choices shown in the GUI, mapped to the generators' walk= argument
+WALK_CHOICES = {'Natural order': 'natural', 'Serpentine': 'serpentine'}
+
 class CombinedLabelGeneratorApp:
     def __init__(self, root):
         self.root = root
@@ -724,11 +2649,20 @@ class CombinedLabelGeneratorApp:
         # Button frame
         button_frame1 = ttk.Frame(self.tab1)
         button_frame1.grid(row=2, column=0, sticky="ew", padx=10, pady=10)
-        button_frame1.columnconfigure(1, weight=1)
+        button_frame1.columnconfigure(5, weight=1)
         
         ttk.Button(button_frame1, text="Generate PDF", command=self.generate_pdf_tab1).grid(row=0, column=0, padx=(0, 5))
-        ttk.Button(button_frame1, text="Clear", command=self.clear_form_tab1).grid(row=0, column=1, padx=5)
-        ttk.Button(button_frame1, text="Exit", command=self.root.quit).grid(row=0, column=2, padx=(5, 0))
+        ttk.Button(button_frame1, text="Check Data", command=self.check_data_tab1).grid(row=0, column=1, padx=5)
+        self.all_sheets_var1 = tk.BooleanVar()
+        ttk.Checkbutton(button_frame1, text="All sheets", variable=self.all_sheets_var1).grid(row=0, column=2, padx=5)
+        self.barcodes_var1 = tk.StringVar(value="No barcodes")
+        ttk.Combobox(button_frame1, textvariable=self.barcodes_var1, values=list(BARCODE_CHOICES),
+                     state="readonly", width=12).grid(row=0, column=3, padx=5)
+        self.walk_var1 = tk.StringVar(value="Natural order")
+        ttk.Combobox(button_frame1, textvariable=self.walk_var1, values=list(WALK_CHOICES),
+                     state="readonly", width=12).grid(row=0, column=4, padx=5)
+        ttk.Button(button_frame1, text="Clear", command=self.clear_form_tab1).grid(row=0, column=5, padx=5)
+        ttk.Button(button_frame1, text="Exit", command=self.root.quit).grid(row=0, column=6, padx=(5, 0))
         
         # Set up stdout redirection for logging
         self.redirect1 = RedirectText(self.log_text1)
@@ -781,11 +2715,20 @@ class CombinedLabelGeneratorApp:
         # Button frame
         button_frame2 = ttk.Frame(self.tab2)
         button_frame2.grid(row=2, column=0, sticky="ew", padx=10, pady=10)
-        button_frame2.columnconfigure(1, weight=1)
+        button_frame2.columnconfigure(5, weight=1)
         
         ttk.Button(button_frame2, text="Generate PDF", command=self.generate_pdf_tab2).grid(row=0, column=0, padx=(0, 5))
-        ttk.Button(button_frame2, text="Clear", command=self.clear_form_tab2).grid(row=0, column=1, padx=5)
-        ttk.Button(button_frame2, text="Exit", command=self.root.quit).grid(row=0, column=2, padx=(5, 0))
+        ttk.Button(button_frame2, text="Check Data", command=self.check_data_tab2).grid(row=0, column=1, padx=5)
+        self.all_sheets_var2 = tk.BooleanVar()
+        ttk.Checkbutton(button_frame2, text="All sheets", variable=self.all_sheets_var2).grid(row=0, column=2, padx=5)
+        self.barcodes_var2 = tk.StringVar(value="No barcodes")
+        ttk.Combobox(button_frame2, textvariable=self.barcodes_var2, values=list(BARCODE_CHOICES),
+                     state="readonly", width=12).grid(row=0, column=3, padx=5)
+        self.walk_var2 = tk.StringVar(value="Natural order")
+        ttk.Combobox(button_frame2, textvariable=self.walk_var2, values=list(WALK_CHOICES),
+                     state="readonly", width=12).grid(row=0, column=4, padx=5)
+        ttk.Button(button_frame2, text="Clear", command=self.clear_form_tab2).grid(row=0, column=5, padx=5)
+        ttk.Button(button_frame2, text="Exit", command=self.root.quit).grid(row=0, column=6, padx=(5, 0))
         
         # Set up stdout redirection for logging
         self.redirect2 = RedirectText(self.log_text2)
@@ -837,12 +2780,24 @@ class CombinedLabelGeneratorApp:
             messagebox.showerror("Error", "Please select both input and output files")
             return
         
+        # Check the first labels in a quick preview; the full PDF is only generated once it's accepted
+        self.show_preview(file_path, 'v2', WALK_CHOICES[self.walk_var1.get()], self.start_generation_tab1)
+
+    def start_generation_tab1(self):
+        """Generate the full Enhanced PDF, once the preview has been accepted"""
+        file_path = self.file_path_var1.get()
+        output_path = self.output_path_var1.get()
+        
         # Clear log and reset progress
         self.log_text1.config(state="normal")
         self.log_text1.delete(1.0, tk.END)
         self.log_text1.config(state="disabled")
         self.progress_var1.set(0)
         
+        # Barcode and label order choices from the dropdowns (barcodes None for plain labels)
+        barcodes = BARCODE_CHOICES[self.barcodes_var1.get()]
+        walk = WALK_CHOICES[self.walk_var1.get()]
+        
         # Redirect stdout to our log widget
         old_stdout = sys.stdout
         sys.stdout = self.redirect1
@@ -851,13 +2806,28 @@ class CombinedLabelGeneratorApp:
             # Run the PDF generation in a separate thread to keep UI responsive
             def run_generation():
                 try:
-                    # Call version 2 of the generator with status and progress callbacks
-                    result = generate_labels_from_excel_v2(
-                        file_path, 
-                        output_path,
-                        status_callback=self.update_status_tab1,
-                        progress_callback=self.update_progress_tab1
-                    )
+                    if self.all_sheets_var1.get():
+                        # Every sheet of the workbook, rendered in parallel into one PDF
+                        paths = generate_labels_from_workbook(
+                            file_path,
+                            output_path,
+                            layout='v2',
+                            status_callback=self.update_status_tab1,
+                            progress_callback=self.update_progress_tab1,
+                            barcodes=barcodes,
+                            walk=walk
+                        )
+                        result = paths[0] if paths else None
+                    else:
+                        # Call version 2 of the generator with status and progress callbacks
+                        result = generate_labels_from_excel_v2(
+                            file_path, 
+                            output_path,
+                            status_callback=self.update_status_tab1,
+                            progress_callback=self.update_progress_tab1,
+                            barcodes=barcodes,
+                            walk=walk
+                        )
                     
                     # Show result in UI thread
                     self.root.after(0, lambda: self.show_result_tab1(result))
@@ -882,11 +2852,23 @@ class CombinedLabelGeneratorApp:
             messagebox.showerror("Error", "Please select both input and output files")
             return
         
+        # Check the first labels in a quick preview; the full PDF is only generated once it's accepted
+        self.show_preview(file_path, 'v1', WALK_CHOICES[self.walk_var2.get()], self.start_generation_tab2)
+
+    def start_generation_tab2(self):
+        """Generate the full Standard PDF, once the preview has been accepted"""
+        file_path = self.file_path_var2.get()
+        output_path = self.output_path_var2.get()
+        
         # Clear log
         self.log_text2.config(state="normal")
         self.log_text2.delete(1.0, tk.END)
         self.log_text2.config(state="disabled")
         
+        # Barcode and label order choices from the dropdowns (barcodes None for plain labels)
+        barcodes = BARCODE_CHOICES[self.barcodes_var2.get()]
+        walk = WALK_CHOICES[self.walk_var2.get()]
+        
         # Redirect stdout to our log widget
         old_stdout = sys.stdout
         sys.stdout = self.redirect2
@@ -895,8 +2877,14 @@ class CombinedLabelGeneratorApp:
             # Run the PDF generation in a separate thread to keep UI responsive
             def run_generation():
                 try:
-                    # Call version 1 of the generator
-                    result = generate_labels_from_excel_v1(file_path, output_path)
+                    if self.all_sheets_var2.get():
+                        # Every sheet of the workbook, rendered in parallel into one PDF
+                        paths = generate_labels_from_workbook(file_path, output_path, layout='v1', barcodes=barcodes,
+                                                              walk=walk)
+                        result = paths[0] if paths else None
+                    else:
+                        # Call version 1 of the generator
+                        result = generate_labels_from_excel_v1(file_path, output_path, barcodes=barcodes, walk=walk)
                     
                     # Show result in UI thread
                     self.root.after(0, lambda: self.show_result_tab2(result))
@@ -912,6 +2900,97 @@ class CombinedLabelGeneratorApp:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
             sys.stdout = old_stdout
 
+    def show_preview(self, file_path, layout, walk, on_accept):
+        """
+        Show the first labels of file_path in a preview window; on_accept starts the full run.
+        The file is read and rasterized on a worker thread, the window is built on the UI thread.
+        If the preview fails, the user can still go ahead with the full run.
+        """
+        def run_preview():
+            try:
+                start = time.perf_counter()
+                image, columns = preview_labels(file_path, layout=layout, walk=walk)
+                png = io.BytesIO()
+                image.save(png, format='PNG')
+                seconds = time.perf_counter() - start
+                self.root.after(0, lambda: self.open_preview_window(png.getvalue(), columns, seconds, on_accept))
+            except Exception as e:
+                message = str(e)
+                self.root.after(0, lambda: preview_failed(message))
+
+        def preview_failed(message):
+            # The preview only reads the first rows; the full run may still work, so let the user decide
+            if messagebox.askyesno("Preview failed", f"Could not preview labels: {message}\n\n"
+                                                     "Generate the full PDF anyway?"):
+                on_accept()
+
+        threading.Thread(target=run_preview, daemon=True).start()
+
+    def open_preview_window(self, png, columns, seconds, on_accept):
+        """Preview window with the rendered labels, the detected columns and accept/cancel buttons"""
+        window = tk.Toplevel(self.root)
+        window.title("Label Preview")
+        window.transient(self.root)
+
+        part_no_col, desc_col, loc_col = columns
+        ttk.Label(window, text=f"Part No: {part_no_col}    Description: {desc_col}    Location: {loc_col}",
+                  font=("Helvetica", 11)).pack(padx=10, pady=(10, 5))
+
+        # Tk reads PNG data directly, so no extra imaging module is needed
+        image = tk.PhotoImage(data=base64.b64encode(png).decode('ascii'), format='png')
+        image_label = ttk.Label(window, image=image)
+        image_label.image = image  # Keep a reference, Tk doesn't
+        image_label.pack(padx=10, pady=5)
+
+        ttk.Label(window, text=f"First labels from the first {PREVIEW_ROWS} rows "
+                               f"(rendered in {seconds:.2f}s)").pack(padx=10)
+
+        def accept():
+            window.destroy()
+            on_accept()
+
+        button_frame = ttk.Frame(window)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Generate PDF", command=accept).grid(row=0, column=0, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=window.destroy).grid(row=0, column=1, padx=5)
+        window.grab_set()
+
+    def check_data_tab1(self):
+        """Validate the input file and show a dry-run plan for the Enhanced layout"""
+        file_path = self.file_path_var1.get()
+        if not file_path:
+            messagebox.showerror("Error", "Please select an input file")
+            return
+
+        self.log_text1.config(state="normal")
+        self.log_text1.delete(1.0, tk.END)
+        self.log_text1.config(state="disabled")
+
+        def run_check():
+            check_label_file(file_path, layout='v2', status_callback=self.update_status_tab1)
+
+        threading.Thread(target=run_check, daemon=True).start()
+
+    def check_data_tab2(self):
+        """Validate the input file and show a dry-run plan for the Standard layout"""
+        file_path = self.file_path_var2.get()
+        if not file_path:
+            messagebox.showerror("Error", "Please select an input file")
+            return
+
+        self.log_text2.config(state="normal")
+        self.log_text2.delete(1.0, tk.END)
+        self.log_text2.config(state="disabled")
+
+        def run_check():
+            check_label_file(file_path, layout='v1', status_callback=self.update_status_tab2)
+
+        threading.Thread(target=run_check, daemon=True).start()
+
+    def update_status_tab2(self, message):
+        """Update status in log text widget for tab 2"""
+        self.redirect2.write(message + "\n")
+
     def update_status_tab1(self, message):
         """Update status in log text widget for tab 1"""
         self.log_text1.config(state="normal")
@@ -993,6 +3072,63 @@ class CombinedLabelGeneratorApp:
 
 # Main execution block
 if __name__ == "__main__":
+    # Frozen Windows builds re-run this entry point in every worker process
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Generate part labels from Excel files")
+    parser.add_argument('--serve', action='store_true', help="run the local label HTTP service instead of the GUI")
+    parser.add_argument('--host', default='127.0.0.1', help="service host (default 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="service port (default 8765)")
+    parser.add_argument('--workers', type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument('--max-queue', type=int, default=16, help="requests allowed to wait for a worker")
+    parser.add_argument('--watch', metavar='FOLDER', help="regenerate labels for spreadsheets dropped into FOLDER")
+    parser.add_argument('--shard', metavar='FILE', help="write one PDF per location zone of FILE plus a manifest")
+    parser.add_argument('--shard-by', choices=list(SHARD_LEVELS), default='zone',
+                        help="split --shard output by zone or by zone and station (default zone)")
+    parser.add_argument('--optimize-size', action='store_true',
+                        help="write smaller PDFs with --shard (same look, shared label outlines)")
+    parser.add_argument('--walk', choices=list(WALK_ORDERS), default='natural',
+                        help="label order for --shard: natural, or serpentine by level (default natural)")
+    parser.add_argument('--export-png', metavar='FILE',
+                        help="write one PNG per location of FILE for digital bin displays")
+    parser.add_argument('--dpi', type=int, default=200, help="resolution of --export-png images (default 200)")
+    parser.add_argument('--benchmark-size', metavar='FILE',
+                        help="compare PDF size and render time of the default and size-optimized output for FILE")
+    parser.add_argument('--layout', choices=['v1', 'v2'], default='v2',
+                        help="label layout for --watch, --shard and --export-png (default v2)")
+    parser.add_argument('--output-dir', default=None,
+                        help="where --watch and --shard write PDFs (default: the input's folder) and "
+                             "--export-png writes PNGs (default: <input>_png next to the input)")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_labels(args.host, args.port, args.workers, args.max_queue)
+        sys.exit(0)
+
+    if args.watch:
+        watch_folder(args.watch, layout=args.layout, output_dir=args.output_dir, workers=args.workers)
+        sys.exit(0)
+
+    if args.shard:
+        manifest = generate_labels_by_zone(args.shard, output_dir=args.output_dir, layout=args.layout,
+                                           shard_by=args.shard_by, workers=args.workers,
+                                           optimize_size=args.optimize_size, walk=args.walk)
+        sys.exit(0 if manifest else 1)
+
+    if args.export_png:
+        output_dir = args.output_dir or os.path.splitext(args.export_png)[0] + '_png'
+        try:
+            export_label_images(args.export_png, output_dir, layout=args.layout, dpi=args.dpi,
+                                workers=args.workers)
+        except Exception as e:
+            print(f"Error exporting label images: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.benchmark_size:
+        results = benchmark_pdf_size(args.benchmark_size)
+        sys.exit(0 if results else 1)
+
     # Set up the main application window
     root = tk.Tk()
     app = CombinedLabelGeneratorApp(root)
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import pandas as pd
+import pytest
+import sys
+import threading
+
+import invent
+
+# Locations in the "12M - LH -R-0-2-A-1" format parse into fewer than 7 components
+SHORT_LOCATIONS = ['12M - LH -R-0-2-A-1', '12M - LH -R-0-3-A-1', '13M - RH -L-1-1-B-2']
+
+
+def short_location_frame():
+    return pd.DataFrame({
+        'Part No': ['P1', 'P2', 'P3'],
+        'Description': ['BOLT', 'NUT', 'WASHER'],
+        'Location': SHORT_LOCATIONS,
+    })
+
+
+def test_split_location_components_pads_short_locations():
+    components = invent.split_location_components(pd.Series(SHORT_LOCATIONS + [None]))
+    assert list(components.columns) == invent.LOCATION_COMPONENTS
+    for location, row in zip(SHORT_LOCATIONS + [None], components.itertuples(index=False)):
+        assert list(row) == invent.parse_location_string_v1(location)
+
+
+def test_split_location_components_empty():
+    components = invent.split_location_components(pd.Series([], dtype=object))
+    assert components.empty
+    assert list(components.columns) == invent.LOCATION_COMPONENTS
+
+
+def test_location_index_with_short_locations():
+    df = short_location_frame()
+    index = invent.LocationIndex(df, 'Location')
+    assert len(index) == 3
+    assert list(index.subset(zone='12M')['Part No']) == ['P1', 'P2']
+
+
+def test_generators_render_short_locations(tmp_path):
+    csv_path = tmp_path / 'labels.csv'
+    short_location_frame().to_csv(csv_path, index=False)
+    for generate in (invent.generate_labels_from_excel_v1, invent.generate_labels_from_excel_v2):
+        pdf_path = str(tmp_path / f'{generate.__name__}.pdf')
+        assert generate(str(csv_path), pdf_path) == pdf_path
+        with open(pdf_path, 'rb') as f:
+            assert f.read(5) == b'%PDF-'
+
+
+def test_render_labels_short_locations():
+    for layout in ('v1', 'v2'):
+        assert invent.render_labels(short_location_frame(), layout=layout).startswith(b'%PDF-')
+
+
+def test_validation_reports_positions_for_string_index():
+    df = short_location_frame()
+    df.index = ['a', 'b', 'c']
+    df.loc['b', 'Part No'] = 'P<2'
+    issues = invent.validate_label_data(df, 'Part No', 'Description', 'Location')
+    assert list(issues.loc[issues['severity'] == 'error', 'row']) == [3]
+
+
+def test_render_labels_string_index_with_status_callback():
+    df = short_location_frame()
+    df.index = ['a', 'b', 'c']
+    for layout in ('v1', 'v2'):
+        messages = []
+        assert invent.render_labels(df, layout=layout, status_callback=messages.append).startswith(b'%PDF-')
+        assert any(line.startswith('Using columns') for line in messages)
+
+
+def test_part_number_cells_are_bold():
+    for layout in invent.LABEL_LAYOUTS:
+        slots = [slot for slot in invent.compile_label_layout(layout).slots if slot.format == 'part_no']
+        assert slots and all(slot.font == 'Helvetica-Bold' for slot in slots)
+
+
+def test_qr_modules_match_reportlab():
+    from reportlab.graphics.barcode import qrencoder
+    for value in ['12M_ST-140_R_0_2_A_1', 'PN-00000X', '12345', 'ÄÖü €', 'x' * 150, '9' * 900]:
+        reference = qrencoder.QRCode(None, invent.QR_ERROR_CORRECTION)
+        reference.addData(value)
+        reference.version = reference.calculate_version()
+        reference.makeImpl(False, invent.QR_MASK_PATTERN)
+        qr = qrencoder.QRCode(None, invent.QR_ERROR_CORRECTION)
+        qr.addData(value)
+        qr.version = qr.calculate_version()
+        assert (invent._qr_modules(qr) == [[bool(m) for m in row] for row in reference.modules]).all()
+
+
+def test_qr_falls_back_to_reportlab_make(monkeypatch):
+    from reportlab.graphics.barcode import qrencoder
+
+    def internals_changed(qr):
+        raise AttributeError("'QRCode' object has no attribute 'dataPosIterator'")
+
+    monkeypatch.setattr(invent, '_qr_modules', internals_changed)
+    for value in ['12M_ST-140_R_0_2_A_1', 'PN-00000X']:
+        reference = qrencoder.QRCode(None, invent.QR_ERROR_CORRECTION)
+        reference.addData(value)
+        reference.make()
+        assert (invent._qr_matrix(value) == [[bool(m) for m in row] for row in reference.modules]).all()
+    with pytest.raises(ValueError):
+        invent._qr_matrix('9' * 8000)
+
+
+def test_barcode_rows_render():
+    for barcodes in invent.BARCODE_SYMBOLOGIES:
+        pdf = invent.render_labels(short_location_frame(), layout='v1', barcodes=barcodes)
+        assert pdf.startswith(b'%PDF-')
+
+
+def test_export_label_images_accepts_path_objects(tmp_path):
+    source = tmp_path / 'labels.csv'
+    short_location_frame().to_csv(source, index=False)
+    result = invent.export_label_images(source, tmp_path / 'png', dpi=30, workers=1, status_callback=lambda line: None)
+    assert len(result['written']) == 3
+    assert all(os.path.exists(path) for path in result['written'])
+
+
+def test_prebuilt_location_index_is_reused(monkeypatch):
+    df = short_location_frame()
+    index = invent.LocationIndex(df, 'Location')
+    expected = invent.label_records(df, location_filter={'zone': '12M'})
+
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError("LocationIndex rebuilt")
+
+    monkeypatch.setattr(invent.LocationIndex, '__init__', no_rebuild)
+    assert invent.label_records(df, location_filter={'zone': '12M'}, location_index=index) == expected
+    for layout in ('v1', 'v2'):
+        pdf = invent.render_labels(df, layout=layout, location_filter={'zone': '13M'}, location_index=index)
+        assert pdf.startswith(b'%PDF-')
+
+
+def test_location_index_for_other_data_is_rejected():
+    index = invent.LocationIndex(short_location_frame().head(2), 'Location')
+    with pytest.raises(ValueError):
+        invent.label_records(short_location_frame(), location_filter={'zone': '12M'}, location_index=index)
+
+
+def test_paragraph_cache_hands_out_separate_paragraphs():
+    cache = invent.ParagraphCache()
+    first = cache.get('<b>P1</b>', invent.desc_style)
+    second = cache.get('<b>P1</b>', invent.desc_style)
+    assert first is not second
+    assert first.blPara is second.blPara
+    assert cache.counters() == (1, 1)
+
+
+def test_concurrent_renders_match(monkeypatch):
+    monkeypatch.setattr(invent.rl_config, 'invariant', 1)
+    stdout = sys.stdout
+    df = short_location_frame()
+    expected = invent.render_labels(df)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(invent.render_labels(df))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [expected] * 4
+    assert sys.stdout is stdout
+
+
+def test_parallel_optimized_renders_restore_a85_setting():
+    use_a85 = invent.rl_config.useA85
+    df = short_location_frame()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(invent.render_labels(df, optimize_size=True)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 4 and all(b'/ASCII85Decode' not in pdf for pdf in results)
+    assert invent.rl_config.useA85 == use_a85
+    assert b'/ASCII85Decode' in invent.render_labels(df)
+
+
+def test_label_service_status_codes():
+    records = json.dumps([{'part_no': 'P1', 'description': 'BOLT', 'location': '12M_ST-140_R_0_2_A_1'}]).encode()
+
+    def request_head(body):
+        return (f"POST /labels HTTP/1.1\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n").encode('latin1')
+
+    async def post(port, body):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request_head(body) + body)
+        response = await reader.read()
+        writer.close()
+        return int(response.split(b' ', 2)[1]), response
+
+    async def run():
+        service = invent.LabelService(port=0, workers=1, max_queue=0)
+        await service.start()
+        try:
+            assert (await post(service.port, b'[]'))[0] == 422
+
+            # A request still uploading its body holds the only place, so the next one is
+            # turned away without its body being read
+            reader, writer = await asyncio.open_connection('127.0.0.1', service.port)
+            writer.write(request_head(records) + records[:10])
+            await writer.drain()
+            for _ in range(500):
+                if service.queued:
+                    break
+                await asyncio.sleep(0.01)
+            assert service.queued == 1
+            assert (await post(service.port, records))[0] == 503
+
+            writer.write(records[10:])
+            response = await reader.read()
+            writer.close()
+            assert response.startswith(b'HTTP/1.1 200 ')
+            assert b'%PDF-' in response
+        finally:
+            await service.close()
+
+    asyncio.run(run())